@@ -1,11 +1,117 @@
 # ant_colony.py
+import multiprocessing as mp
+from multiprocessing import shared_memory
 import numpy as np
+import metrics
+
+
+# Per-process state for parallel workers (set by _init_worker)
+_worker = {}
+
+
+def _init_worker(tables, shm_names, shape):
+    _worker['tables'] = tables
+    _worker['shm'] = [shared_memory.SharedMemory(name=name) for name in shm_names]
+    _worker['weights'] = np.ndarray(shape[1:], dtype=np.float64, buffer=_worker['shm'][0].buf)
+    _worker['deposits'] = np.ndarray(shape, dtype=np.float64, buffer=_worker['shm'][1].buf)
+
+
+def _worker_task(args):
+    """Runs one chunk of ants and writes its deposits into its shared slot"""
+    slot, num_ants, seed = args
+    # The visited map is kept between tasks; construct_ants clears what it set
+    visited = _worker.get('visited')
+    if visited is None or len(visited) < num_ants:
+        visited = _worker['visited'] = visited_map(num_ants, len(_worker['weights']))
+    deposit, best_path, lengths = construct_ants(
+        num_ants, np.random.default_rng(seed), weights=_worker['weights'], visited=visited,
+        **_worker['tables'])
+    _worker['deposits'][slot] = deposit
+    return best_path, lengths
+
+
+def visited_map(num_ants, size):
+    """(ant, state) visited flags for construct_ants"""
+    return np.zeros((num_ants, size), dtype=bool)
+
+
+def construct_ants(num_ants, rng, transitions, action_mask, weights, start, goal, max_steps,
+                   visited=None):
+    """Builds num_ants paths at once with a vectorized roulette wheel.
+
+    transitions/action_mask are the maze's (states, 4) index, weights the
+    per-state attractiveness tau^alpha * eta^beta. visited is an all-clear
+    visited_map with at least num_ants rows to reuse; it is left clear
+    again. Returns the pheromone deposit (1 / path length on each visited
+    state), the shortest path as states (or None) and the lengths of the
+    successful paths.
+    """
+    size = len(transitions)
+    if visited is None:
+        visited = visited_map(num_ants, size)
+    visited = visited[:num_ants]
+    visited[:, start] = True
+    cur = np.full(num_ants, start, dtype=np.int64)
+    alive = np.arange(num_ants) if start != goal else np.arange(0)
+    lengths = np.zeros(num_ants, dtype=np.int64)
+    if start == goal:
+        lengths[:] = 1
+    log = []  # (ant ids, states entered) for every step, as int32
+    steps = 0
+
+    while len(alive) and steps < max_steps:
+        c = cur[alive]
+        nb = transitions[c]
+        allowed = action_mask[c] & ~visited[alive[:, None], nb]
+        w = np.where(allowed, weights[nb], 0.0)
+
+        # All-zero weights fall back to a uniform pick among allowed moves
+        flat = allowed & (w.sum(axis=1) == 0)[:, None]
+        w = np.where(flat, 1.0, w)
+        cum = np.cumsum(w, axis=1)
+        total = cum[:, -1]
+
+        # Dead ends: no unvisited road left
+        moving = total > 0
+        alive, nb, cum, total = alive[moving], nb[moving], cum[moving], total[moving]
+
+        u = rng.random(len(alive)) * total
+        pick = (cum > u[:, None]).argmax(axis=1)
+        nxt = nb[np.arange(len(alive)), pick]
+
+        cur[alive] = nxt
+        visited[alive, nxt] = True
+        log.append((alive.astype(np.int32), nxt.astype(np.int32)))
+        steps += 1
+
+        arrived = nxt == goal
+        lengths[alive[arrived]] = steps + 1
+        alive = alive[~arrived]
+
+    ants = np.concatenate([a for a, _ in log]) if log else np.zeros(0, dtype=np.int32)
+    cells = np.concatenate([c for _, c in log]) if log else np.zeros(0, dtype=np.int32)
+    # Leave the map clear for the next call
+    visited[ants, cells] = False
+    visited[:, start] = False
+
+    done = np.flatnonzero(lengths)
+    deposit = np.zeros(size)
+    best_path = None
+    if len(done):
+        # Every state an arriving ant entered (each once) gets 1 / its length
+        share = np.zeros(num_ants)
+        share[done] = 1.0 / lengths[done]
+        np.add.at(deposit, cells, share[ants])
+        deposit[start] += share.sum()
+        best = done[np.argmin(lengths[done])]
+        best_path = [start] + cells[ants == best].tolist()
+    return deposit, best_path, lengths[done]
 
 
 class AntColonySolver:
     def __init__(self, maze, num_ants=20, num_iterations=50,
                  alpha=1.0, beta=2.0, evaporation=0.5,
-                 initial_pheromone=None):
+                 initial_pheromone=None, workers=None, seed=None):
         self.maze = maze
         self.num_ants = num_ants
         self.num_iterations = num_iterations
@@ -18,13 +124,23 @@ class AntColonySolver:
             # Use slime mold conductivity as initial pheromones
             self.pheromones = initial_pheromone.copy()
         else:
-            self.pheromones = np.ones((maze.height, maze.width))
+            self.pheromones = np.ones(maze.state_shape, dtype=maze.dtype)
 
-        self.pheromones[maze.grid == 1] = 0
+        self.pheromones[maze.state_values(maze.grid) == 1] = 0
 
         self.best_path = None
         self.best_length = float('inf')
 
+        # Per-ant walk buffers, allocated once per solve (see construct_solution)
+        self._path = None
+        self._seen = None
+
+        # Parallel mode: ants of each iteration spread over a process pool
+        self.workers = workers
+        # seed: int, SeedSequence or np.random.Generator
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+
     def heuristic(self, current, neighbor):
         """Distance-based heuristic (closer to goal = better)"""
         goal = self.maze.end
@@ -32,86 +148,189 @@ class AntColonySolver:
                        (neighbor[1] - goal[1]) ** 2)
         return 1.0 / (dist + 1)  # Avoid division by zero
 
+    def heuristic_field(self):
+        """heuristic of every state at once"""
+        maze = self.maze
+        xs, ys = np.divmod(maze.state_cells, maze.width)
+        dist = np.sqrt((xs - maze.end[0]) ** 2 + (ys - maze.end[1]) ** 2)
+        return 1.0 / (dist + 1)
+
     def select_next(self, current, visited):
-        """Probabilistic path selection"""
-        neighbors = self.maze.get_neighbors(current)
-        neighbors = [n for n in neighbors if n not in visited]
+        """Probabilistic choice among current's unvisited neighbours (None at a dead end).
 
+        One step of the roulette construct_solution runs over whole paths,
+        for callers that walk an ant cell by cell.
+        """
+        neighbors = [n for n in self.maze.get_neighbors(current) if n not in visited]
         if not neighbors:
             return None
-
-        # Calculate probabilities
-        probabilities = []
-        for neighbor in neighbors:
-            tau = self.pheromones[neighbor[0], neighbor[1]]
-            eta = self.heuristic(current, neighbor)
-            prob = (tau ** self.alpha) * (eta ** self.beta)
-            probabilities.append(prob)
-
-        # Normalize
-        total = sum(probabilities)
+        weights = np.array([self.pheromones.flat[self.maze.state_index(n)] ** self.alpha *
+                            self.heuristic(current, n) ** self.beta for n in neighbors])
+        total = weights.sum()
         if total == 0:
-            return np.random.choice(neighbors)
+            return neighbors[self.rng.integers(len(neighbors))]
+        return neighbors[self.rng.choice(len(neighbors), p=weights / total)]
+
+    def state_weights(self):
+        """Attractiveness tau^alpha * eta^beta of every state, as a list for scalar lookups"""
+        return (self.pheromones.reshape(-1) ** self.alpha * self._eta_beta).tolist()
 
-        probabilities = np.array(probabilities) / total
+    def prepare(self):
+        """Neighbour lists and the reusable walk buffers for construct_solution"""
+        maze = self.maze
+        indptr, indices = maze.neighbor_csr  # get_neighbors order
+        self._indptr, self._indices = indptr.tolist(), indices.tolist()
+        self._eta_beta = self.heuristic_field() ** self.beta
+        self._start, self._goal = maze.state_index(maze.start), maze.state_index(maze.end)
+        # A path never revisits a state, so it has at most num_states of them
+        self._path = np.empty(maze.num_states, dtype=np.int32)
+        self._seen = bytearray(maze.num_states)
+        self._seen_view = np.frombuffer(self._seen, dtype=np.uint8)
 
-        # Roulette wheel selection
-        idx = np.random.choice(len(neighbors), p=probabilities)
-        return neighbors[idx]
+    def construct_solution(self, weights=None):
+        """Single ant constructs a path: its states (int32 array), or None at a dead end.
 
-    def construct_solution(self):
-        """Single ant constructs a path"""
-        path = [self.maze.start]
-        visited = set(path)
-        current = self.maze.start
+        Steps go into a preallocated buffer and visits into a byte map, both
+        reused by every ant; only a finished path is copied out.
+        weights: state_weights() of the current pheromones.
+        """
+        if self._path is None:
+            self.prepare()
+        if weights is None:
+            weights = self.state_weights()
+        indptr, indices = self._indptr, self._indices
+        path, seen = self._path, self._seen
+        random = self.rng.random
+        current, goal = self._start, self._goal
+        path[0] = current
+        seen[current] = 1
+        n = 1
 
-        max_steps = self.maze.height * self.maze.width
-        steps = 0
+        while current != goal:
+            neighbors = [s for s in indices[indptr[current]:indptr[current + 1]] if not seen[s]]
+            if not neighbors:
+                break  # Dead end
 
-        while current != self.maze.end and steps < max_steps:
-            next_pos = self.select_next(current, visited)
-            if next_pos is None:
-                return None  # Dead end
+            # Roulette wheel selection
+            chances = [weights[s] for s in neighbors]
+            total = sum(chances)
+            if total == 0:
+                current = neighbors[self.rng.integers(len(neighbors))]
+            else:
+                u = random() * total
+                for current, chance in zip(neighbors, chances):
+                    u -= chance
+                    if u < 0:
+                        break
 
-            path.append(next_pos)
-            visited.add(next_pos)
-            current = next_pos
-            steps += 1
+            path[n] = current
+            seen[current] = 1
+            n += 1
 
-        if current == self.maze.end:
-            return path
+        self._seen_view[path[:n]] = 0  # Clear only what this ant visited
+        if current == goal:
+            return path[:n].copy()
         return None
 
     def update_pheromones(self, all_paths):
-        """Update pheromone levels"""
+        """Update pheromone levels; all_paths holds construct_solution's state arrays"""
         # Evaporation
         self.pheromones *= (1 - self.evaporation)
 
-        # Deposit pheromones
-        for path in all_paths:
-            if path is not None:
-                deposit = 1.0 / len(path)  # Shorter paths get more pheromone
-                for pos in path:
-                    self.pheromones[pos[0], pos[1]] += deposit
+        # Deposit pheromones: shorter paths get more, one scatter-add for all ants
+        all_paths = [p for p in all_paths if p is not None]
+        if all_paths:
+            lengths = [len(p) for p in all_paths]
+            amounts = np.repeat(1.0 / np.array(lengths), lengths)
+            np.add.at(self.pheromones.reshape(-1), np.concatenate(all_paths), amounts)
 
+    def record_metrics(self, ants, lengths):
+        """Publishes one iteration's counters; lengths of the ants that arrived"""
+        metrics.inc('maze_episodes_total', ants, solver='aco')
+        metrics.inc('maze_steps_total', int(sum(lengths)) - len(lengths), solver='aco')
+        metrics.inc('maze_dead_ends_total', ants - len(lengths), solver='aco')
+
+    @metrics.timed('aco')
     def solve(self):
         """Main ACO loop"""
+        if self.workers:
+            return self.solve_parallel()
+
+        self.prepare()
         for iteration in range(self.num_iterations):
-            # All ants construct solutions
+            # All ants construct solutions on this iteration's pheromones
+            weights = self.state_weights()
             all_paths = []
             for _ in range(self.num_ants):
-                path = self.construct_solution()
+                path = self.construct_solution(weights)
                 if path is not None:
                     all_paths.append(path)
 
                     # Track best path
                     if len(path) < self.best_length:
-                        self.best_path = path
+                        self.best_path = [self.maze.state_pos(s) for s in path]
                         self.best_length = len(path)
 
             # Update pheromones
             self.update_pheromones(all_paths)
+            self.record_metrics(self.num_ants, [len(p) for p in all_paths])
 
             print(f"Iteration {iteration + 1}: Best length = {self.best_length}")
 
         return self.best_path
+
+    def solve_parallel(self):
+        """ACO loop with vectorized ants spread over a process pool.
+
+        Each chunk of ants gets its own RNG stream spawned from seed, so runs
+        are reproducible regardless of scheduling. Attractiveness and
+        per-chunk deposits live in shared memory; deposits are reduced into
+        the pheromone matrix once per iteration.
+        """
+        maze = self.maze
+        size = maze.num_states
+        eta_beta = self.heuristic_field() ** self.beta
+        tables = dict(transitions=maze.transitions, action_mask=maze.action_mask,
+                      start=maze.state_index(maze.start), goal=maze.state_index(maze.end),
+                      max_steps=size)
+
+        chunks = min(self.workers, self.num_ants)
+        counts = [len(c) for c in np.array_split(np.arange(self.num_ants), chunks)]
+        shape = (chunks, size)
+        shm = [shared_memory.SharedMemory(create=True, size=size * 8),
+               shared_memory.SharedMemory(create=True, size=chunks * size * 8)]
+        weights = np.ndarray(shape[1:], dtype=np.float64, buffer=shm[0].buf)
+        deposits = np.ndarray(shape, dtype=np.float64, buffer=shm[1].buf)
+        pheromones = self.pheromones.reshape(-1)
+
+        _init_worker(tables, [m.name for m in shm], shape)
+        pool = mp.Pool(self.workers, _init_worker, (tables, [m.name for m in shm], shape)) \
+            if self.workers > 1 else None
+        try:
+            for iteration in range(self.num_iterations):
+                weights[:] = pheromones ** self.alpha * eta_beta
+                tasks = list(zip(range(chunks), counts, self.rng.spawn(chunks)))
+                results = pool.map(_worker_task, tasks) if pool else [_worker_task(t) for t in tasks]
+
+                self.record_metrics(self.num_ants, np.concatenate([lengths for _, lengths in results]))
+                for path, lengths in results:
+                    if path is not None and len(path) < self.best_length:
+                        self.best_path = [maze.state_pos(c) for c in path]
+                        self.best_length = len(path)
+
+                # Evaporate, then reduce every chunk's deposits
+                pheromones *= (1 - self.evaporation)
+                pheromones += deposits.sum(axis=0)
+
+                print(f"Iteration {iteration + 1}: Best length = {self.best_length}")
+        finally:
+            if pool:
+                pool.terminate()
+            for m in _worker.pop('shm', []):
+                m.close()
+            _worker.clear()
+            for m in shm:
+                m.close()
+                m.unlink()
+
+        return self.best_path
\ No newline at end of file
@@ -0,0 +1,263 @@
+# artery_router.py
+import heapq
+import numpy as np
+import metrics
+from shortest_path import ShortestPathSolver
+
+
+class ArteryRouter:
+    """Two-level routing over the city's artery grid.
+
+    generate_manhattan_grid lays a road down every 4th row and column (plus
+    the perimeter). Their intersections form a coarse graph whose edges are
+    the artery stretches between neighbouring intersections, costed from
+    traffic_jams the way ShortestPathSolver costs cells (1 + 2 * traffic per
+    cell entered). A query searches exact costs only inside the blocks around
+    start and end (refine_blocks extra blocks on each side), then runs A* over
+    the intersections, so its work follows the number of intersections and
+    not the number of cells.
+
+    The coarse A* is weighted (f = g + weight * h), which trades optimality
+    for far fewer expansions: its route costs at most weight times the best
+    route over the arteries (weight=1 finds that best one). Between the two
+    refined windows routes keep to the arteries, so shortcuts through alleys
+    there are not taken either. Maps whose arteries do not connect start and
+    end fall back to the exact A*.
+    The graph is rebuilt when the map's version changes.
+    """
+
+    def __init__(self, maze, refine_blocks=1, weight=1.25, traffic_weight=2.0):
+        self.maze = maze
+        self.refine_blocks = refine_blocks
+        self.weight = weight
+        self.traffic_weight = traffic_weight
+        self.version = None
+        self.expanded = 0  # Coarse nodes settled by the last query
+
+    def build(self):
+        """Intersections and per-segment costs of the artery grid"""
+        maze = self.maze
+        h, w = maze.height, maze.width
+        walk = maze.walkable
+        # Same rule as the generator: every 4th line inside the perimeter, and the perimeter
+        self.rows = np.union1d(np.arange(1, h - 1, 4), [h - 2]) if h > 2 else np.zeros(0, dtype=int)
+        self.cols = np.union1d(np.arange(1, w - 1, 4), [w - 2]) if w > 2 else np.zeros(0, dtype=int)
+        costs = 1.0 + self.traffic_weight * np.maximum(maze.traffic_jams, 0)
+
+        # Stretches along the artery rows (right/left) and down the columns (down/up)
+        right, left = self._segments(costs[self.rows], walk[self.rows], self.cols)
+        down, up = self._segments(costs[:, self.cols].T, walk[:, self.cols].T, self.rows)
+        self.nodes_open = walk[np.ix_(self.rows, self.cols)]
+        self._right, self._left = memoryview(right.ravel()), memoryview(left.ravel())
+        self._down, self._up = memoryview(down.T.ravel()), memoryview(up.T.ravel())
+        self.version = maze.version
+
+    @staticmethod
+    def _segments(costs, walk, stops):
+        """(forward, backward) entry costs of each stretch between consecutive stops.
+
+        costs and walk are (lines, length) rows along the arteries; a stretch
+        with any building on it (intersections included) costs inf.
+        """
+        lines = len(costs)
+        if len(stops) < 2:
+            empty = np.zeros((lines, 0))
+            return empty, empty
+        forward = np.empty((lines, len(stops) - 1))
+        backward = np.empty_like(forward)
+        end = stops[-1] + 1
+        # In blocks of lines, to bound the temporaries on very large maps
+        for first in range(0, lines, 256):
+            part = slice(first, first + 256)
+            c = costs[part, :end]
+            # Forward enters stops[k]+1 .. stops[k+1], backward stops[k] .. stops[k+1]-1
+            forward[part] = np.add.reduceat(c, stops[:-1] + 1, axis=1)
+            backward[part] = np.add.reduceat(c[:, :end - 1], stops[:-1], axis=1)
+            blocked = np.add.reduceat(~walk[part, :end], stops[:-1], axis=1)
+            blocked |= ~walk[part][:, stops[1:]]
+            forward[part][blocked > 0] = np.inf
+            backward[part][blocked > 0] = np.inf
+        return forward, backward
+
+    def _window(self, pos):
+        """(x0, x1, y0, y1) inclusive bounds of the refined blocks around pos"""
+        k = self.refine_blocks
+        bounds = []
+        for v, lines, size in ((pos[0], self.rows, self.maze.height), (pos[1], self.cols, self.maze.width)):
+            i = int(np.searchsorted(lines, v, side='right')) - 1
+            lo, hi = i - k, i + 1 + k
+            bounds += [int(lines[lo]) if lo >= 0 else 0, int(lines[hi]) if hi < len(lines) else size - 1]
+        return bounds[0], bounds[1], bounds[2], bounds[3]
+
+    def _local(self, pos, window, toward):
+        """Exact costs inside window from pos (toward=False) or to pos (toward=True).
+
+        Returns (dist, link, width): window-shaped costs, per cell the flat
+        window index of the previous (from pos) or next (to pos) cell, and
+        the window's width.
+        """
+        x0, x1, y0, y1 = window
+        walk = self.maze.walkable[x0:x1 + 1, y0:y1 + 1]
+        costs = (1.0 + self.traffic_weight * np.maximum(self.maze.traffic_jams[x0:x1 + 1, y0:y1 + 1], 0)).ravel().tolist()
+        hw, ww = walk.shape
+        open_ = walk.ravel().tolist()
+        dist = [float('inf')] * (hw * ww)
+        link = [-1] * (hw * ww)
+        source = (pos[0] - x0) * ww + (pos[1] - y0)
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            d, cell = heapq.heappop(heap)
+            if d > dist[cell]:
+                continue
+            x, y = divmod(cell, ww)
+            for nxt in (cell - ww if x > 0 else -1, cell + ww if x < hw - 1 else -1,
+                        cell - 1 if y > 0 else -1, cell + 1 if y < ww - 1 else -1):
+                if nxt < 0 or not open_[nxt]:
+                    continue
+                # Toward pos, a step from nxt enters cell; away from it, it enters nxt
+                nd = d + (costs[cell] if toward else costs[nxt])
+                if nd < dist[nxt]:
+                    dist[nxt] = nd
+                    link[nxt] = cell
+                    heapq.heappush(heap, (nd, nxt))
+        return np.array(dist).reshape(hw, ww), link, ww
+
+    def _window_nodes(self, window, dist):
+        """{node: cost} of the intersections inside window reached by dist"""
+        x0, x1, y0, y1 = window
+        nc = len(self.cols)
+        found = {}
+        for i in np.flatnonzero((self.rows >= x0) & (self.rows <= x1)).tolist():
+            for j in np.flatnonzero((self.cols >= y0) & (self.cols <= y1)).tolist():
+                d = dist[self.rows[i] - x0, self.cols[j] - y0]
+                if d < np.inf:
+                    found[i * nc + j] = float(d)
+        return found
+
+    @metrics.timed('hierarchical')
+    def solve(self):
+        """Route from maze.start to maze.end as (x, y) cells; [] if unreachable"""
+        maze = self.maze
+        start, end = tuple(maze.start), tuple(maze.end)
+        if not (maze.is_valid(*start) and maze.is_valid(*end)):
+            return []
+        if self.version != maze.version:
+            self.build()
+
+        # 1. Exact costs inside the start and end windows
+        start_win, end_win = self._window(start), self._window(end)
+        from_start, prev, start_w = self._local(start, start_win, toward=False)
+        to_end, nxt, end_w = self._local(end, end_win, toward=True)
+        sources = self._window_nodes(start_win, from_start)
+        targets = self._window_nodes(end_win, to_end)
+
+        # Both ends in one window: the local route is a candidate too
+        direct = float('inf')
+        x0, x1, y0, y1 = start_win
+        if x0 <= end[0] <= x1 and y0 <= end[1] <= y1:
+            direct = from_start[end[0] - x0, end[1] - y0]
+
+        # 2. A* over the intersections, seeded with every reachable corner
+        cost, first, last, parent = self._coarse(sources, targets, end, direct)
+        if cost == float('inf'):
+            # The arteries do not join start and end (e.g. a custom layout)
+            print("⚠️ Arteries do not connect start and end, falling back to exact A*...")
+            return ShortestPathSolver(maze).solve()
+
+        # 3. Stitch: local route to the first intersection, arteries, local route to end
+        if first is None:
+            return self._unwind(end, start_win, prev, start_w)[::-1]
+        path = self._unwind(self._node_pos(first), start_win, prev, start_w)[::-1]
+        nodes = [last]
+        while nodes[-1] != first:
+            nodes.append(parent[nodes[-1]])
+        nodes.reverse()
+        for a, b in zip(nodes, nodes[1:]):
+            path.extend(self._stretch(self._node_pos(a), self._node_pos(b)))
+        path.extend(self._unwind(self._node_pos(last), end_win, nxt, end_w)[1:])
+        return path
+
+    def _coarse(self, sources, targets, end, bound):
+        """Multi-source A* to a virtual goal behind targets; (cost, first, last, parent)"""
+        nc = len(self.cols)
+        rows, cols = self.rows.tolist(), self.cols.tolist()
+        is_open = memoryview(self.nodes_open.ravel())
+        right, left, down, up = self._right, self._left, self._down, self._up
+        ex, ey = end
+        weight = self.weight
+        goal = -1
+
+        best = {}
+        parent = {}
+        heap = []
+        for node, g in sources.items():
+            best[node] = g
+            parent[node] = None
+            i, j = divmod(node, nc)
+            heapq.heappush(heap, (g + weight * (abs(rows[i] - ex) + abs(cols[j] - ey)), -g, node))
+        best[goal] = bound
+        if bound < float('inf'):
+            heapq.heappush(heap, (bound, -bound, goal))
+        expanded = 0
+        while heap:
+            _, neg_g, node = heapq.heappop(heap)
+            g = -neg_g
+            if node == goal:
+                break
+            if g > best[node]:
+                continue  # Stale heap entry
+            expanded += 1
+            tail = targets.get(node)
+            if tail is not None and g + tail < best[goal]:
+                best[goal] = g + tail
+                parent[goal] = node
+                heapq.heappush(heap, (g + tail, -(g + tail), goal))
+            i, j = divmod(node, nc)
+            for nb, step in ((node + 1, right[i * (nc - 1) + j] if j < nc - 1 else np.inf),
+                             (node - 1, left[i * (nc - 1) + j - 1] if j > 0 else np.inf),
+                             (node + nc, down[i * nc + j] if i < len(rows) - 1 else np.inf),
+                             (node - nc, up[(i - 1) * nc + j] if i > 0 else np.inf)):
+                if step == np.inf or not is_open[nb]:
+                    continue
+                ng = g + step
+                if ng < best.get(nb, float('inf')):
+                    best[nb] = ng
+                    parent[nb] = node
+                    ni, nj = divmod(nb, nc)
+                    heapq.heappush(heap, (ng + weight * (abs(rows[ni] - ex) + abs(cols[nj] - ey)), -ng, nb))
+        self.expanded = expanded
+
+        last = parent.get(goal)
+        if last is None:
+            return best[goal], None, None, parent
+        first = last
+        while parent[first] is not None:
+            first = parent[first]
+        return best[goal], first, last, parent
+
+    def _node_pos(self, node):
+        i, j = divmod(node, len(self.cols))
+        return int(self.rows[i]), int(self.cols[j])
+
+    @staticmethod
+    def _stretch(a, b):
+        """Cells after a up to b along one artery"""
+        (ax, ay), (bx, by) = a, b
+        if ax == bx:
+            step = 1 if by > ay else -1
+            return [(ax, y) for y in range(ay + step, by + step, step)]
+        step = 1 if bx > ax else -1
+        return [(x, ay) for x in range(ax + step, bx + step, step)]
+
+    @staticmethod
+    def _unwind(pos, window, link, ww):
+        """Cells from pos following link to the window's source, pos first"""
+        x0, _, y0, _ = window
+        cell = (pos[0] - x0) * ww + (pos[1] - y0)
+        path = []
+        while cell != -1:
+            x, y = divmod(cell, ww)
+            path.append((x + x0, y + y0))
+            cell = link[cell]
+        return path
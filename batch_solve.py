@@ -0,0 +1,156 @@
+# batch_solve.py
+"""Offline batch solving: scenarios in, results out, both as JSON lines.
+
+Each input line is one scenario; every field but seed is optional:
+
+    {"id": "od-1", "seed": 7, "size": 41, "start": [1, 1], "end": [39, 39],
+     "solver": "hybrid", "episodes": 5000}
+
+size defaults to 41 (or give width/height), start to (1, 1), end to the
+opposite corner, solver to 'hybrid' ('planned' for model-based Q-values,
+'astar' for the exact route, 'hierarchical' for a fast route over the
+arteries) and episodes to the map's adaptive budget
+with early stopping. Each output line echoes the scenario and adds its
+line number, status, route length and cost, and per-phase timings in
+seconds. Results are written as they finish,
+so the output is usable while a long run is still going.
+
+    python batch_solve.py scenarios.jsonl results.jsonl --workers 8
+"""
+import argparse
+import contextlib
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from collections import OrderedDict
+from city_generator import CityMap
+from hybrid_solver import HybridMazeSolver
+from shortest_path import route_cost
+
+# Maps recently generated by this process, keyed by (seed, width, height):
+# origin/destination studies solve many scenarios on the same few cities
+_maps = OrderedDict()
+MAX_CACHED_MAPS = 8
+
+
+def get_map(seed, width, height):
+    key = (seed, width, height)
+    maze = _maps.get(key)
+    if maze is None:
+        maze = CityMap(width=width, height=height, seed=seed)
+        maze.generate_manhattan_grid()
+        _maps[key] = maze
+        while len(_maps) > MAX_CACHED_MAPS:
+            _maps.popitem(last=False)
+    _maps.move_to_end(key)
+    return maze
+
+
+def solve_scenario(index, line, include_path=False):
+    """Solves one JSONL scenario line; never raises, errors become records"""
+    began = time.perf_counter()
+    result = {"line": index}
+    try:
+        scenario = json.loads(line)
+        result.update(scenario)
+        seed = scenario.get("seed", 0)
+        width = scenario.get("width", scenario.get("size", 41))
+        height = scenario.get("height", scenario.get("size", 41))
+
+        maze = get_map(seed, width, height)
+        generated = time.perf_counter()
+
+        start = tuple(scenario.get("start", (1, 1)))
+        end = tuple(scenario.get("end", (maze.height - 2, maze.width - 2)))
+        for name, (x, y) in (("start", start), ("end", end)):
+            if not maze.is_valid(x, y):
+                raise ValueError(f"{name} {[x, y]} is not on a road")
+        maze.start, maze.end = start, end
+
+        # Seeded per scenario, so a result does not depend on which worker
+        # ran it or what ran before
+        solver = HybridMazeSolver(maze, seed=seed)
+        with contextlib.redirect_stdout(None):
+            path = solver.solve(training_episodes=scenario.get("episodes"), batch_size=128,
+                                strategy=scenario.get("solver", "hybrid"), early_stopping=True)
+        solved = time.perf_counter()
+
+        reached = bool(path) and tuple(path[-1]) == end
+        result.update({
+            "status": "success" if reached else "no_route",
+            "path_length": len(path) if path else 0,
+            "cost": route_cost(maze, path) if reached else None,
+            "episodes_run": solver.rl_solver.episodes_done if hasattr(solver, "rl_solver") else 0,
+            "timings": {"generate": round(generated - began, 4),
+                        "solve": round(solved - generated, 4)},
+        })
+        if include_path:
+            result["path"] = [list(p) for p in path] if path else []
+    except Exception as e:
+        result.update({"status": "error", "error": f"{type(e).__name__}: {e}"})
+    result["elapsed"] = round(time.perf_counter() - began, 4)
+    return result
+
+
+def _solve_task(args):
+    return solve_scenario(*args)
+
+
+def read_scenarios(filename):
+    """(line number, raw line) for every non-blank line, read lazily"""
+    with (sys.stdin if filename == "-" else open(filename)) as f:
+        for index, line in enumerate(f, 1):
+            if line.strip():
+                yield index, line
+
+
+def run_batch(scenarios, output, workers=None, include_path=False, chunksize=4):
+    """Solves scenarios on a process pool, writing result lines as they finish.
+
+    Results arrive in completion order; each carries its input line number.
+    Returns (total, failed) counts.
+    """
+    workers = workers or os.cpu_count() or 1
+    tasks = ((index, line, include_path) for index, line in scenarios)
+    total = failed = 0
+    began = time.perf_counter()
+
+    pool = mp.Pool(workers) if workers > 1 else None
+    try:
+        results = pool.imap_unordered(_solve_task, tasks, chunksize) if pool else map(_solve_task, tasks)
+        for result in results:
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            total += 1
+            failed += result["status"] == "error"
+            if total % 100 == 0:
+                rate = total / (time.perf_counter() - began)
+                print(f"⚡ {total} scenarios done ({rate:.1f}/s)", file=sys.stderr)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    return total, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve many maze scenarios from a JSONL file.")
+    parser.add_argument("scenarios", help="input JSONL file ('-' for stdin)")
+    parser.add_argument("results", help="output JSONL file ('-' for stdout)")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--paths", action="store_true", help="include full routes in the output")
+    parser.add_argument("--chunksize", type=int, default=4, help="scenarios handed to a worker at once")
+    args = parser.parse_args(argv)
+
+    began = time.perf_counter()
+    with (contextlib.nullcontext(sys.stdout) if args.results == "-" else open(args.results, "w")) as out:
+        total, failed = run_batch(read_scenarios(args.scenarios), out, workers=args.workers,
+                                  include_path=args.paths, chunksize=args.chunksize)
+    print(f"✅ {total} scenarios in {time.perf_counter() - began:.1f}s ({failed} failed)",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
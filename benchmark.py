@@ -0,0 +1,243 @@
+# benchmark.py
+"""Benchmark harness: per-phase wall time, peak memory and route quality.
+
+Runs every phase of the pipeline over a matrix of map sizes and traffic
+densities and writes one JSON record per (size, density, phase):
+
+    generate     CityMap generation plus its index
+    slime        SlimeMoldSolver.solve
+    qlearning    batched QLearningSolver.solve (episodes/sec)
+    planning     QLearningSolver.solve_planning (state backups)
+    reconstruct  QLearningSolver.reconstruct_path
+    astar        ShortestPathSolver.solve (the exact reference route)
+    hierarchical ArteryRouter.solve (graph build included)
+    aco          vectorized AntColonySolver (small maps only)
+    export       export_simulation to a JSON file
+    json         the /generate JSON payload encoding
+
+Route quality is the route's traffic-weighted cost over the A* cost (1.0 is
+optimal). Density scales the number of traffic lines per area relative to
+the default city (1.0 = 15 lines on 41x41). Peak memory comes from
+tracemalloc, which numpy reports its buffers to; tracing slows the
+allocation-heavy loops down, so it runs as a separate, identical (seeded)
+pass. Reported times are the best of --repeat untraced passes.
+
+    python benchmark.py run -o baseline.json
+    python benchmark.py run --sizes 41 101 --densities 1 -o quick.json
+    python benchmark.py compare baseline.json              # rerun, then compare
+    python benchmark.py compare baseline.json current.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from city_generator import CityMap
+from slime_mold import SlimeMoldSolver
+from q_learning import QLearningSolver
+from shortest_path import ShortestPathSolver, route_cost
+from artery_router import ArteryRouter
+from ant_colony import AntColonySolver
+from exporter import export_simulation
+import metrics
+import wire_format
+
+SIZES = [41, 101, 201, 501, 1001]
+DENSITIES = [0.5, 1.0, 2.0]
+
+
+def measure(fn):
+    """(result, seconds, peak MB) of fn(); peak is None unless tracemalloc is on"""
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+    began = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - began
+    peak = (tracemalloc.get_traced_memory()[1] - base) / 2 ** 20 if tracing else None
+    return result, seconds, peak
+
+
+def build_city(size, density, seed):
+    maze = CityMap(width=size, height=size, seed=seed)
+    maze.generate_manhattan_grid(traffic_density=density * CityMap.TRAFFIC_DENSITY)
+    maze.transitions  # Build the index inside the timed phase
+    return maze
+
+
+def run_case(size, density, seed=0, episodes=2000, aco_max_size=101):
+    """All phases on one city; returns the per-phase records"""
+    records = []
+
+    def add(name, fn, stats=None):
+        result, seconds, peak = measure(fn)
+        record = {"size": size, "density": density, "phase": name,
+                  "seconds": round(seconds, 5), "peak_mb": None if peak is None else round(peak, 3)}
+        if stats:
+            record.update(stats(result, seconds))
+        records.append(record)
+        return result
+
+    maze = add("generate", lambda: build_city(size, density, seed),
+               lambda m, s: {"roads": int(m.walkable.sum()),
+                             "traffic_cells": int((m.traffic_jams > 0).sum())})
+    conductivity = add("slime", lambda: SlimeMoldSolver(maze, seed=seed).solve())
+    exact = add("astar", lambda: ShortestPathSolver(maze).solve(),
+                lambda p, s: {"length": len(p), "cost": route_cost(maze, p) if p else None})
+    best = route_cost(maze, exact) if exact else None
+
+    def quality(path):
+        reached = bool(path) and tuple(path[-1]) == maze.end
+        return {"reached": reached,
+                "quality": round(route_cost(maze, path) / best, 4) if reached and best else None}
+
+    add("hierarchical", ArteryRouter(maze).solve, lambda p, s: quality(p))
+
+    rl = QLearningSolver(maze, conductivity_map=conductivity, episodes=episodes,
+                         batch_size=128, seed=seed)
+    add("qlearning", rl.solve,
+        lambda p, s: dict(quality(p), episodes=rl.episodes_done,
+                          episodes_per_s=round(rl.episodes_done / s, 1)))
+    path = add("reconstruct", rl.reconstruct_path, lambda p, s: quality(p))
+    planner = QLearningSolver(maze, conductivity_map=conductivity, planning=True)
+    add("planning", planner.solve, lambda p, s: dict(quality(p), backups=planner.backups))
+
+    if size <= aco_max_size:
+        aco = AntColonySolver(maze, num_ants=64, num_iterations=5, initial_pheromone=conductivity,
+                              workers=1, seed=seed)
+        add("aco", aco.solve, lambda p, s: quality(p))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        target = os.path.join(tmp, "traffic_data.json")
+        add("export", lambda: export_simulation(maze, conductivity, path, filename=target),
+            lambda _, s: {"bytes": os.path.getsize(target)})
+
+    result = {"status": "success", "dimensions": {"width": maze.width, "height": maze.height},
+              "grid": maze.grid, "traffic": maze.traffic_jams, "conductivity": conductivity,
+              "path": path, "start": maze.start, "end": maze.end}
+    # A fresh store, as for a client the server has not sent layers to yet
+    add("json", lambda: json.dumps(wire_format.json_payload(result, store=wire_format.LayerStore())),
+        lambda body, s: {"bytes": len(body)})
+    return records
+
+
+def run(sizes, densities, seed=0, episodes=2000, aco_max_size=101, memory=True, repeat=3):
+    # Times are of the uninstrumented solvers, whatever enabled metrics before
+    metrics.enable(False)
+    results = []
+    for size in sizes:
+        for density in densities:
+            print(f"⚡ size={size} density={density}", file=sys.stderr)
+            with contextlib.redirect_stdout(None):
+                records = run_case(size, density, seed, episodes, aco_max_size)
+                for _ in range(repeat - 1):
+                    # Seeded, so every pass does the same work; keep the fastest
+                    for record, again in zip(records, run_case(size, density, seed, episodes, aco_max_size)):
+                        if again["seconds"] < record["seconds"]:
+                            record.update(again)
+                if memory:
+                    tracemalloc.start()
+                    try:
+                        traced = run_case(size, density, seed, episodes, aco_max_size)
+                    finally:
+                        tracemalloc.stop()
+                    for record, again in zip(records, traced):
+                        record["peak_mb"] = again["peak_mb"]
+            results.extend(records)
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.platform(),
+            "cpus": os.cpu_count(),
+            "settings": {"sizes": sizes, "densities": densities, "seed": seed,
+                         "episodes": episodes, "aco_max_size": aco_max_size, "memory": memory, "repeat": repeat},
+        },
+        "results": results,
+    }
+
+
+def compare(baseline, current, threshold=0.25, min_seconds=0.005):
+    """Regressions of current against baseline, as printable lines.
+
+    Time and peak memory regress when they grow by more than threshold
+    (times under min_seconds are noise); quality regresses when a route is
+    no longer reached or its cost ratio rises by more than 1%.
+    """
+    key = lambda r: (r["size"], r["density"], r["phase"])
+    before = {key(r): r for r in baseline["results"]}
+    problems = []
+    for rec in current["results"]:
+        old = before.get(key(rec))
+        if old is None:
+            continue
+        label = f"size={rec['size']} density={rec['density']} {rec['phase']}"
+        if rec["seconds"] > old["seconds"] * (1 + threshold) and rec["seconds"] - old["seconds"] > min_seconds:
+            problems.append(f"{label}: time {old['seconds']:.4f}s -> {rec['seconds']:.4f}s "
+                            f"(+{rec['seconds'] / old['seconds'] - 1:.0%})")
+        if rec["peak_mb"] and old["peak_mb"] and rec["peak_mb"] > old["peak_mb"] * (1 + threshold) \
+                and rec["peak_mb"] - old["peak_mb"] > 1:
+            problems.append(f"{label}: peak memory {old['peak_mb']:.1f}MB -> {rec['peak_mb']:.1f}MB")
+        if old.get("reached") and not rec.get("reached"):
+            problems.append(f"{label}: route no longer reaches the destination")
+        elif old.get("quality") and rec.get("quality") and rec["quality"] > old["quality"] + 0.01:
+            problems.append(f"{label}: quality {old['quality']} -> {rec['quality']}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-phase benchmarks with regression tracking.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_p = sub.add_parser("run", help="run the benchmark matrix")
+    run_p.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    run_p.add_argument("--densities", type=float, nargs="+", default=DENSITIES)
+    run_p.add_argument("--seed", type=int, default=0)
+    run_p.add_argument("--episodes", type=int, default=2000, help="Q-learning episodes per case")
+    run_p.add_argument("--aco-max-size", type=int, default=101, help="skip ACO on larger maps")
+    run_p.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    run_p.add_argument("--repeat", type=int, default=3, help="timing passes (best is kept)")
+    run_p.add_argument("-o", "--output", default="-", help="results JSON ('-' for stdout)")
+
+    cmp_p = sub.add_parser("compare", help="flag regressions against a baseline")
+    cmp_p.add_argument("baseline")
+    cmp_p.add_argument("current", nargs="?", help="results JSON (default: rerun the baseline's settings)")
+    cmp_p.add_argument("--threshold", type=float, default=0.25, help="allowed relative slowdown")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        report = run(args.sizes, args.densities, args.seed, args.episodes, args.aco_max_size,
+                     memory=not args.no_memory, repeat=args.repeat)
+        text = json.dumps(report, indent=1)
+        if args.output == "-":
+            print(text)
+        else:
+            with open(args.output, "w") as f:
+                f.write(text)
+            print(f"✅ {len(report['results'])} results saved to {args.output}", file=sys.stderr)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        current = run(**baseline["meta"]["settings"])
+    problems = compare(baseline, current, threshold=args.threshold)
+    for line in problems:
+        print(f"❌ {line}")
+    if not problems:
+        print(f"✅ No regressions in {len(current['results'])} results")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,101 +1,559 @@
 # city_generator.py
+import copy
 import numpy as np
-import random
 
 
 class CityMap:
-    def __init__(self, width=41, height=41):
+    # Move order shared by the precomputed tables (up, down, left, right)
+    ACTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+    # get_neighbors keeps its historical order (down, up, right, left)
+    NEIGHBOR_ORDER = [1, 0, 3, 2]
+    # Rows filled per pass when (re)building the index
+    BLOCK = 2 ** 18
+    # Generator defaults per cell: 20 alleys and 15 traffic jams on 41x41
+    ALLEY_DENSITY = 20 / (41 * 41)
+    TRAFFIC_DENSITY = 15 / (41 * 41)
+    # No traffic within this Manhattan distance of start and end
+    SAFE_RADIUS = 4
+
+    def __init__(self, width=41, height=41, compact=False, seed=None, layers=None):
         self.width = width if width % 2 != 0 else width + 1
         self.height = height if height % 2 != 0 else height + 1
-        self.grid = np.ones((self.height, self.width))
+        # Compact maps store uint8/float32 layers and index only road cells,
+        # so solver tables hold one row per road instead of per cell
+        self.compact = compact
+        # seed: int, SeedSequence or np.random.Generator; same seed, same city
+        self.rng = np.random.default_rng(seed)
+        self.dtype = np.float32 if compact else np.float64
+        self.version = 0
+        self._index_dirty = True
+        self._goal_dirty = True
+        self._csr = None
+        self._cells = None
+        self._state_of = None
+        self._tile_seed = None
+        self._index_shared = False
+        # layers: existing (grid, traffic_jams) to use as they are, e.g.
+        # memory-mapped from a saved model, instead of allocating blank ones
+        if layers is None:
+            layers = (np.ones((self.height, self.width), dtype=np.uint8 if compact else np.float64),
+                      np.zeros((self.height, self.width), dtype=self.dtype))
+        self.grid, self.traffic_jams = layers
         self.start = (1, 1)
         self.end = (self.height - 2, self.width - 2)
-        self.traffic_jams = np.zeros((self.height, self.width))
 
-    def generate_manhattan_grid(self):
-        """Generates a Dense Urban Grid"""
+    # --- Change tracking -------------------------------------------------
+    # Replacing grid, traffic_jams or end invalidates the cached index.
+    # In-place edits of the arrays must be followed by invalidate(cells).
+
+    @property
+    def grid(self):
+        return self._grid
+
+    @grid.setter
+    def grid(self, value):
+        self._grid = value
+        self.invalidate()
+
+    @property
+    def traffic_jams(self):
+        return self._traffic_jams
+
+    @traffic_jams.setter
+    def traffic_jams(self, value):
+        self._traffic_jams = value
+        self.invalidate()
+
+    @property
+    def start(self):
+        return self._start
+
+    @start.setter
+    def start(self, value):
+        # No cached table depends on the start cell
+        self._start = tuple(value)
+
+    @property
+    def end(self):
+        return self._end
+
+    @end.setter
+    def end(self, value):
+        value = tuple(value)
+        if getattr(self, '_end', None) != value:
+            self._end = value
+            self._goal_dirty = True
+
+    def invalidate(self, cells=None):
+        """Marks cached tables stale, either entirely or around the given cells"""
+        self.version += 1
+        self._csr = None
+        if cells is None or self._index_dirty:
+            self._index_dirty = True
+            return
+        if self._index_shared:
+            self._own_index()
+        cells = np.asarray(cells, dtype=int).reshape(-1, 2)
+        self._refresh_cells(cells[:, 0] * self.width + cells[:, 1])
+
+    def snapshot(self):
+        """Copy that can be edited independently, e.g. a job's private map.
+
+        Read-only layers (a memory-mapped model) are shared; set_traffic
+        copies them on first write. Writeable layers are copied. The index
+        is shared by both maps until either edits it in place.
+        """
+        clone = copy.copy(self)
+        clone.rng = copy.deepcopy(self.rng)
+        for name in ('_grid', '_traffic_jams'):
+            layer = getattr(self, name)
+            if layer.flags.writeable:
+                setattr(clone, name, layer.copy())
+        if not self._index_dirty:
+            self._index_shared = clone._index_shared = True
+        return clone
+
+    def generate_manhattan_grid(self, alley_density=None, traffic_density=None, tile_size=None):
+        """Generates a Dense Urban Grid
+
+        Alley and traffic densities are per cell (defaults: ALLEY_DENSITY
+        and TRAFFIC_DENSITY, i.e. 20 alleys and 15 jams on 41x41), so larger
+        maps get proportionally more of both. With tile_size the map is
+        carved tile by tile (see generate_tile), which bounds the
+        temporaries on very large cities.
+        """
+        if tile_size is None:
+            self._carve(self._grid, self._traffic_jams, 0, 0, self.rng, alley_density, traffic_density)
+        else:
+            for x0, y0, grid, traffic in self.iter_tiles(tile_size, alley_density, traffic_density):
+                self._grid[x0:x0 + grid.shape[0], y0:y0 + grid.shape[1]] = grid
+                self._traffic_jams[x0:x0 + grid.shape[0], y0:y0 + grid.shape[1]] = traffic
+        self.invalidate()
+
+    def generate_tile(self, x0, y0, tile_size=1024, alley_density=None, traffic_density=None):
+        """(grid, traffic) of the tile at (x0, y0), carved on demand.
+
+        Every tile has its own RNG stream derived from the map's seed and
+        the tile's position, so tiles come out the same in any order and a
+        caller can stream a huge city without holding all of it. Alleys and
+        jams stay inside their tile. The map itself is not modified.
+        """
+        if self._tile_seed is None:
+            self._tile_seed = int(self.rng.integers(2 ** 63))
+        shape = (min(tile_size, self.height - x0), min(tile_size, self.width - y0))
+        grid = np.ones(shape, dtype=self._grid.dtype)
+        traffic = np.zeros(shape, dtype=self.dtype)
+        rng = np.random.default_rng([self._tile_seed, x0, y0])
+        self._carve(grid, traffic, x0, y0, rng, alley_density, traffic_density)
+        return grid, traffic
+
+    def iter_tiles(self, tile_size=1024, alley_density=None, traffic_density=None):
+        """Yields (x0, y0, grid, traffic) for every tile, row by row"""
+        for x0 in range(0, self.height, tile_size):
+            for y0 in range(0, self.width, tile_size):
+                yield (x0, y0) + self.generate_tile(x0, y0, tile_size, alley_density, traffic_density)
+
+    def _carve(self, grid, traffic, x0, y0, rng, alley_density=None, traffic_density=None):
+        """Carves roads, alleys and traffic into a window of the map at offset (x0, y0)"""
+        h, w = self.height, self.width
+        th, tw = grid.shape
+        rows = np.arange(x0, x0 + th)
+        cols = np.arange(y0, y0 + tw)
+
         # 1. Main Arteries (Wide Roads)
-        # Every 4th cell is a road
-        for y in range(1, self.width - 1, 4):
-            self.grid[:, y] = 0
-
-        for x in range(1, self.height - 1, 4):
-            self.grid[x, :] = 0
-
-        # 2. Add Random "Alleys" (Break up large blocks)
-        for _ in range(20):
-            rx = random.randint(1, self.height - 2)
-            ry = random.randint(1, self.width - 2)
-            # Carve a small horizontal or vertical alley
-            if random.random() < 0.5:
-                length = random.randint(3, 8)
-                self.grid[rx, ry:min(ry + length, self.width - 1)] = 0
-            else:
-                length = random.randint(3, 8)
-                self.grid[rx:min(rx + length, self.height - 1), ry] = 0
-
-        # 3. Perimeter & Access
-        self.grid[1, :] = 0
-        self.grid[self.height - 2, :] = 0
-        self.grid[:, 1] = 0
-        self.grid[:, self.width - 2] = 0
-        self.grid[self.start] = 0
-        self.grid[self.end] = 0
+        # Every 4th cell is a road, plus the perimeter ring
+        grid[((rows % 4 == 1) & (rows < h - 1)) | (rows == h - 2), :] = 0
+        grid[:, ((cols % 4 == 1) & (cols < w - 1)) | (cols == w - 2)] = 0
+
+        # 2. Add Random "Alleys" (Break up large blocks), all in one batch
+        density = self.ALLEY_DENSITY if alley_density is None else alley_density
+        x, y = self._random_cells(rng, x0, y0, th, tw, int(round(density * th * tw)))
+        across = rng.random(len(x)) < 0.5  # Horizontal or vertical
+        length = rng.integers(3, 9, size=len(x))
+        ax, ay = self._segments(x, y, across, length)
+        # Clipped at the perimeter as before, and at the window's edge
+        keep = (ax >= 0) & (ay >= 0) & (ax < min(h - 1, x0 + th) - x0) & (ay < min(w - 1, y0 + tw) - y0)
+        grid[ax[keep], ay[keep]] = 0
+
+        # 3. Access
+        for x, y in (self.start, self.end):
+            if x0 <= x < x0 + th and y0 <= y < y0 + tw:
+                grid[x - x0, y - y0] = 0
 
         # 4. Traffic
-        self.add_traffic_lines(num_lines=15)
+        density = self.TRAFFIC_DENSITY if traffic_density is None else traffic_density
+        self._add_traffic(grid, traffic, x0, y0, rng, int(round(density * th * tw)))
+
+    def _random_cells(self, rng, x0, y0, th, tw, n):
+        """n random interior cells of the window, as window coordinates"""
+        lo_x, hi_x = max(x0, 1), min(x0 + th, self.height - 1)
+        lo_y, hi_y = max(y0, 1), min(y0 + tw, self.width - 1)
+        if n <= 0 or lo_x >= hi_x or lo_y >= hi_y:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+        return rng.integers(lo_x, hi_x, size=n) - x0, rng.integers(lo_y, hi_y, size=n) - y0
+
+    @staticmethod
+    def _segments(x, y, across, length):
+        """(n, 8) cells of straight segments; cells past a segment's length are masked out as -1"""
+        k = np.arange(8)
+        sx = x[:, None] + np.where(across, 0, 1)[:, None] * k
+        sy = y[:, None] + np.where(across, 1, 0)[:, None] * k
+        past = k >= length[:, None]
+        return np.where(past, -1, sx), np.where(past, -1, sy)
 
     def add_traffic_lines(self, num_lines):
-        count = 0
-        attempts = 0
-
-        # Define Safe Zones (No traffic allowed here)
-        safe_radius = 4
-
-        while count < num_lines and attempts < 200:
-            x = random.randint(1, self.height - 2)
-            y = random.randint(1, self.width - 2)
-
-            # Check distance to start and end
-            d_start = abs(x - self.start[0]) + abs(y - self.start[1])
-            d_end = abs(x - self.end[0]) + abs(y - self.end[1])
-
-            if d_start < safe_radius or d_end < safe_radius:
-                attempts += 1
-                continue
-
-            if self.grid[x, y] == 0:
-                length = random.randint(4, 8)
-                # ... (rest of logic remains same as before) ...
-                if self.grid[x, y + 1] == 0:
-                    dx, dy = 0, 1
-                elif self.grid[x + 1, y] == 0:
-                    dx, dy = 1, 0
-                else:
-                    attempts += 1
-                    continue
-
-                for i in range(length):
-                    nx, ny = x + (dx * i), y + (dy * i)
-                    if 0 <= nx < self.height and 0 <= ny < self.width:
-                        # Double check safe zone for every segment
-                        ds = abs(nx - self.start[0]) + abs(ny - self.start[1])
-                        de = abs(nx - self.end[0]) + abs(ny - self.end[1])
-
-                        if ds > safe_radius and de > safe_radius and self.grid[nx, ny] == 0:
-                            self.traffic_jams[nx, ny] = 5.0  # High penalty
-                        else:
-                            break
-                count += 1
-            attempts += 1
+        """Adds up to num_lines jams of 4-8 road cells outside the start/end safe zones"""
+        self._add_traffic(self._grid, self._traffic_jams, 0, 0, self.rng, num_lines)
+        self.invalidate()
+
+    def _add_traffic(self, grid, traffic, x0, y0, rng, num_lines):
+        if num_lines <= 0:
+            return
+        th, tw = grid.shape
+
+        # Define Safe Zones (No traffic allowed here), once for the window:
+        # the diamonds around start and end, masked out of the roads
+        allowed = grid == 0
+        r = self.SAFE_RADIUS
+        for sx, sy in (self.start, self.end):
+            lo_x, lo_y = max(sx - r, x0), max(sy - r, y0)
+            hi_x, hi_y = min(sx + r + 1, x0 + th), min(sy + r + 1, y0 + tw)
+            if lo_x < hi_x and lo_y < hi_y:
+                rows = np.arange(lo_x, hi_x)[:, None]
+                cols = np.arange(lo_y, hi_y)[None, :]
+                near = np.abs(rows - sx) + np.abs(cols - sy) <= r
+                allowed[lo_x - x0:hi_x - x0, lo_y - y0:hi_y - y0] &= ~near
+
+        # Candidate starts in one batch: about 13 attempts per line, the
+        # ratio of the old fixed 200 attempts for 15 lines
+        x, y = self._random_cells(rng, x0, y0, th, tw, -(-num_lines * 40 // 3))
+        length = rng.integers(4, 9, size=len(x))
+        # Run right if that cell is a road, else down, else give up
+        across = (y + 1 < tw) & (grid[x, np.minimum(y + 1, tw - 1)] == 0)
+        down = (x + 1 < th) & (grid[np.minimum(x + 1, th - 1), y] == 0)
+        pick = np.flatnonzero(allowed[x, y] & (across | down))[:num_lines]
+        x, y, across, length = x[pick], y[pick], across[pick], length[pick]
+
+        sx, sy = self._segments(x, y, across, length)
+        inside = (sx >= 0) & (sx < th) & (sy >= 0) & (sy < tw)
+        ok = inside.copy()
+        ok[inside] = allowed[sx[inside], sy[inside]]
+        # A jam stops at its first cell off the road or in a safe zone
+        ok = np.cumprod(ok, axis=1).astype(bool)
+        traffic[sx[ok], sy[ok]] = 5.0  # High penalty
+
+    def set_traffic(self, cells, severity):
+        """Sets traffic on road cells in place, e.g. from a live feed.
+
+        cells: (x, y) pairs; severity: one value or one per cell (0 clears a
+        jam). Cells off the map or on buildings are ignored. Only the index
+        rows around the cells are refreshed. Returns (flat cells that
+        changed, their previous severity).
+        """
+        cells = np.asarray(cells, dtype=int).reshape(-1, 2)
+        severity = np.broadcast_to(np.asarray(severity, dtype=self.dtype), len(cells))
+        xs, ys = cells[:, 0], cells[:, 1]
+        inside = (xs >= 0) & (xs < self.height) & (ys >= 0) & (ys < self.width)
+        xs, ys, severity = xs[inside], ys[inside], severity[inside]
+        road = self._grid[xs, ys] == 0
+        xs, ys, severity = xs[road], ys[road], severity[road]
+        # A cell listed twice takes its last severity
+        _, last = np.unique((xs * self.width + ys)[::-1], return_index=True)
+        keep = len(xs) - 1 - last
+        xs, ys, severity = xs[keep], ys[keep], severity[keep]
+
+        before = self._traffic_jams[xs, ys]
+        changed = before != severity
+        xs, ys, severity, before = xs[changed], ys[changed], severity[changed], before[changed]
+        if not len(xs):
+            return np.zeros(0, dtype=int), before
+        if not self._traffic_jams.flags.writeable:
+            # Shared read-only layer (e.g. a memory-mapped model): copy on first write
+            self._traffic_jams = self._traffic_jams.copy()
+        self._traffic_jams[xs, ys] = severity
+        self.invalidate(np.stack([xs, ys], axis=1))
+        return xs * self.width + ys, before
+
+    # --- Precomputed index -----------------------------------------------
+
+    def __getstate__(self):
+        # The numpy views would be copied (and pickled) apart from their
+        # bytearrays; __setstate__ re-creates them over the copies
+        state = self.__dict__.copy()
+        state.pop('_move_bits_view', None)
+        state.pop('_walk_view', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if '_move_bits' in state:
+            self._move_bits_view = np.frombuffer(self._move_bits, dtype=np.uint8)
+            self._walk_view = np.frombuffer(self._walk_bytes, dtype=np.uint8)
+
+    def _ensure_index(self):
+        if self._index_dirty:
+            self._build_index()
+        if self._goal_dirty:
+            self._build_goal_progress()
+
+    def _build_index(self):
+        """Builds walkability, action mask, transitions and traffic cost for every state"""
+        size = self.height * self.width
+        self._walkable = self._grid == 0
+        index_dtype = np.int64
+        if self.compact:
+            # Road cells get consecutive ids (states); buildings map to -1
+            self._cells = np.flatnonzero(self._walkable).astype(np.int32)
+            self._state_of = np.full(size, -1, dtype=np.int32)
+            self._state_of[self._cells] = np.arange(len(self._cells), dtype=np.int32)
+            index_dtype = np.int32
+            self._goal_dirty = True
+        states = size if self._cells is None else len(self._cells)
+
+        self._walk_bytes = bytearray(self._walkable.ravel().astype(np.uint8).tobytes())
+        self._action_mask = np.zeros((states, 4), dtype=bool)
+        self._transitions = np.zeros((states, 4), dtype=index_dtype)
+        # Compact maps derive traffic_cost on demand instead of storing it
+        self._traffic_cost = None if self.compact else np.zeros((states, 4), dtype=self.dtype)
+        # bytearrays give fast scalar lookups; the numpy views allow bulk writes
+        self._move_bits = bytearray(size)
+        self._move_bits_view = np.frombuffer(self._move_bits, dtype=np.uint8)
+        self._walk_view = np.frombuffer(self._walk_bytes, dtype=np.uint8)
+        self._index_dirty = False
+        self._index_shared = False
+        # In blocks, to bound the temporaries on very large maps
+        for first in range(0, states, self.BLOCK):
+            self._fill_rows(np.arange(first, min(first + self.BLOCK, states)))
+
+    def _own_index(self):
+        """Private copies of the tables _refresh_cells edits in place"""
+        self._walkable = self._walkable.copy()
+        self._walk_bytes = bytearray(self._walk_bytes)
+        self._move_bits = bytearray(self._move_bits)
+        self._move_bits_view = np.frombuffer(self._move_bits, dtype=np.uint8)
+        self._walk_view = np.frombuffer(self._walk_bytes, dtype=np.uint8)
+        self._action_mask = self._action_mask.copy()
+        self._transitions = self._transitions.copy()
+        if self._traffic_cost is not None:
+            self._traffic_cost = self._traffic_cost.copy()
+        self._index_shared = False
+
+    def _fill_rows(self, states):
+        """Recomputes the per-action rows of the given states"""
+        h, w = self.height, self.width
+        cells = states if self._cells is None else self._cells[states]
+        xs, ys = np.divmod(cells, w)
+        moves = np.array(self.ACTIONS)
+        nx = xs[:, None] + moves[:, 0]
+        ny = ys[:, None] + moves[:, 1]
+
+        inside = (nx >= 0) & (nx < h) & (ny >= 0) & (ny < w)
+        cx, cy = np.clip(nx, 0, h - 1), np.clip(ny, 0, w - 1)
+        mask = inside & self._walkable[cx, cy]
+
+        target = cx * w + cy
+        if self._state_of is not None:
+            target = self._state_of[target]
+
+        self._action_mask[states] = mask
+        # Invalid moves leave the agent where it is
+        self._transitions[states] = np.where(mask, target, states[:, None])
+        if self._traffic_cost is not None:
+            self._traffic_cost[states] = np.where(mask, np.maximum(self._traffic_jams[cx, cy], 0), 0)
+        self._move_bits_view[cells] = (mask * (1 << np.arange(4))).sum(axis=1)
+
+    def _refresh_cells(self, cells):
+        """Rebuilds only the rows touched by a change at the given flat cells"""
+        h, w = self.height, self.width
+        xs, ys = np.divmod(cells, w)
+        walkable = self._grid[xs, ys] == 0
+        if self.compact and (walkable != self._walkable[xs, ys]).any():
+            # Roads opened or closed: the road ids themselves change
+            self._index_dirty = True
+            return
+        self._walkable[xs, ys] = walkable
+        self._walk_view[cells] = walkable
+
+        # A cell's rows depend on itself and its four neighbours
+        moves = np.array([(0, 0)] + self.ACTIONS)
+        nx = (xs[:, None] + moves[:, 0]).ravel()
+        ny = (ys[:, None] + moves[:, 1]).ravel()
+        keep = (nx >= 0) & (nx < h) & (ny >= 0) & (ny < w)
+        states = np.unique(nx[keep] * w + ny[keep])
+        if self._state_of is not None:
+            states = self._state_of[states]
+            states = states[states >= 0]
+        self._fill_rows(states)
+
+    def _build_goal_progress(self):
+        # Like traffic_cost, only dense maps keep the table around
+        self._goal_progress = None if self.compact else self._goal_rows()
+        self._goal_dirty = False
+
+    def _goal_rows(self):
+        """+1 where a move gets closer to end (Manhattan), -1 otherwise"""
+        cells = np.arange(self.height * self.width) if self._cells is None else self._cells
+        xs, ys = np.divmod(cells, self.width)
+        gx, gy = self._end
+        # A step closes in exactly when end lies on that side (ACTIONS order)
+        closer = np.stack([xs > gx, xs < gx, ys > gy, ys < gy], axis=1)
+        return np.where(closer, 1, -1).astype(self.dtype)
+
+    # --- State index -----------------------------------------------------
+    # Solvers address cells by state: the flat cell index x * width + y on
+    # dense maps, a road-only id on compact maps. Per-state arrays have
+    # state_shape, i.e. (H, W) on dense maps and (roads,) on compact ones.
+
+    @property
+    def num_states(self):
+        self._ensure_index()
+        return self.height * self.width if self._cells is None else len(self._cells)
+
+    @property
+    def state_shape(self):
+        self._ensure_index()
+        return (self.height, self.width) if self._cells is None else (len(self._cells),)
+
+    @property
+    def state_cells(self):
+        """Flat cell index of every state"""
+        self._ensure_index()
+        return np.arange(self.height * self.width) if self._cells is None else self._cells
+
+    def state_index(self, pos):
+        """State of the cell at pos (-1 for a building on a compact map)"""
+        x, y = pos
+        if not self.compact:
+            return x * self.width + y
+        self._ensure_index()
+        return int(self._state_of[x * self.width + y])
+
+    def state_indices(self, xs, ys):
+        """Vectorized state_index for arrays of rows and columns"""
+        cells = np.asarray(xs) * self.width + np.asarray(ys)
+        if not self.compact:
+            return cells
+        self._ensure_index()
+        return self._state_of[cells]
+
+    def cells_of(self, states):
+        """Flat cell index of the given states (vectorized state_pos)"""
+        if not self.compact:
+            return np.asarray(states)
+        self._ensure_index()
+        return self._cells[states]
+
+    def state_pos(self, state):
+        """(x, y) of a state"""
+        if self.compact:
+            self._ensure_index()
+            state = self._cells[state]
+        return divmod(int(state), self.width)
+
+    def state_values(self, layer):
+        """Per-state values of an (H, W) layer such as traffic_jams"""
+        if not self.compact:
+            return np.asarray(layer)
+        self._ensure_index()
+        return np.asarray(layer).ravel()[self._cells]
+
+    def to_grid(self, values, fill=0):
+        """Inverse of state_values: per-state values back onto the (H, W) grid"""
+        values = np.asarray(values)
+        if not self.compact:
+            return values
+        self._ensure_index()
+        out = np.full((self.height * self.width,) + values.shape[1:], fill, dtype=values.dtype)
+        out[self._cells] = values
+        return out.reshape((self.height, self.width) + values.shape[1:])
+
+    @property
+    def walkable(self):
+        """(H, W) bool road mask"""
+        self._ensure_index()
+        return self._walkable
+
+    @property
+    def action_mask(self):
+        """(states, 4) bool: which ACTIONS lead onto a road"""
+        self._ensure_index()
+        return self._action_mask
+
+    @property
+    def transitions(self):
+        """(states, 4) state reached by each action (self for blocked moves)"""
+        self._ensure_index()
+        return self._transitions
+
+    @property
+    def traffic_cost(self):
+        """(states, 4) traffic severity of the cell each action enters"""
+        self._ensure_index()
+        if self._traffic_cost is None:
+            traffic = np.maximum(self.state_values(self._traffic_jams), 0).astype(self.dtype)
+            return np.where(self._action_mask, traffic[self._transitions], 0)
+        return self._traffic_cost
+
+    @property
+    def goal_progress(self):
+        """(states, 4) +1/-1 Manhattan progress toward end for each action"""
+        self._ensure_index()
+        if self._goal_progress is None:
+            return self._goal_rows()
+        return self._goal_progress
+
+    @property
+    def neighbor_csr(self):
+        """CSR adjacency (indptr, indices) over states"""
+        self._ensure_index()
+        if self._csr is None:
+            mask = self._action_mask[:, self.NEIGHBOR_ORDER]
+            indptr = np.zeros(len(mask) + 1, dtype=np.int64)
+            np.cumsum(mask.sum(axis=1), out=indptr[1:])
+            indices = self._transitions[:, self.NEIGHBOR_ORDER][mask]
+            self._csr = (indptr, indices)
+        return self._csr
+
+    def reachable(self, pos=None):
+        """(H, W) bool mask of road cells connected to pos (default: start)"""
+        self._ensure_index()
+        x, y = self._start if pos is None else pos
+        seen = np.zeros(self.num_states, dtype=bool)
+        if not self.is_valid(x, y):
+            return self.to_grid(seen.reshape(self.state_shape))
+        # Breadth-first, one whole frontier per step
+        frontier = np.array([self.state_index((x, y))])
+        seen[frontier] = True
+        while len(frontier):
+            nxt = np.unique(self._transitions[frontier][self._action_mask[frontier]])
+            frontier = nxt[~seen[nxt]]
+            seen[frontier] = True
+        return self.to_grid(seen.reshape(self.state_shape))
 
     def is_valid(self, x, y):
+        if self._index_dirty:
+            self._build_index()
         return (0 <= x < self.height and
                 0 <= y < self.width and
-                self.grid[x, y] == 0)
+                self._walk_bytes[x * self.width + y] == 1)
 
     def get_neighbors(self, pos):
+        if self._index_dirty:
+            self._build_index()
         x, y = pos
-        neighbors = [(x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)]
-        return [(nx, ny) for nx, ny in neighbors
-                if self.is_valid(nx, ny)]
\ No newline at end of file
+        if not (0 <= x < self.height and 0 <= y < self.width):
+            return [(nx, ny) for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1))
+                    if self.is_valid(nx, ny)]
+        return [(x + dx, y + dy) for dx, dy in _NEIGHBOR_STEPS[self._move_bits[x * self.width + y]]]
+
+    def valid_actions(self, pos):
+        """Indices into ACTIONS that lead onto a road"""
+        if self._index_dirty:
+            self._build_index()
+        return _VALID_ACTIONS[self._move_bits[pos[0] * self.width + pos[1]]]
+
+
+# Lookup tables from a cell's 4-bit action mask
+_VALID_ACTIONS = [[a for a in range(4) if bits & (1 << a)] for bits in range(16)]
+_NEIGHBOR_STEPS = [[CityMap.ACTIONS[a] for a in CityMap.NEIGHBOR_ORDER if bits & (1 << a)]
+                   for bits in range(16)]
\ No newline at end of file
@@ -1,11 +1,31 @@
 import json
 import numpy as np
+import wire_format
 
 
-def export_simulation(maze, conductivity, path, filename="traffic_data.json"):
+def export_simulation(maze, conductivity, path, filename="traffic_data.json",
+                      binary=None, compress=False, quantize=False):
     """
     Exports the generated city, slime mold data, and calculated path to JSON.
+
+    binary=True (or a .mzs filename) writes the compact wire_format encoding
+    instead; compress/quantize select its zlib and uint8-conductivity variants.
+    conductivity may be None (no slime phase ran): the layer is left out.
     """
+    if binary is None:
+        binary = filename.endswith(".mzs")
+    # Road-only conductivity of a compact map goes back onto the full grid
+    if conductivity is not None:
+        conductivity = maze.to_grid(conductivity)
+
+    if binary:
+        payload = wire_format.encode(maze.grid, maze.traffic_jams, conductivity, path,
+                                     maze.start, maze.end, compress=compress, quantize=quantize)
+        with open(filename, "wb") as f:
+            f.write(payload)
+        print(f"✅ Simulation data saved to {filename} ({len(payload)} bytes)")
+        return
+
     # Convert NumPy arrays to standard lists for JSON serialization
     data = {
         "dimensions": {
@@ -18,8 +38,8 @@ def export_simulation(maze, conductivity, path, filename="traffic_data.json"):
         # Traffic intensity map
         "traffic": maze.traffic_jams.tolist(),
 
-        # Slime mold conductivity (0.0 to 1.0)
-        "conductivity": conductivity.tolist(),
+        # Slime mold conductivity (0.0 to 1.0), null without a slime phase
+        "conductivity": None if conductivity is None else conductivity.tolist(),
 
         # The final Q-Learning path [(x,y), (x,y)...]
         "path": path
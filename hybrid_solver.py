@@ -1,29 +1,174 @@
 # hybrid_solver.py
 from slime_mold import SlimeMoldSolver
-from q_learning import QLearningSolver
+from q_learning import QLearningSolver, episode_budget
+from shortest_path import ShortestPathSolver
+from policy import PolicyField
+from artery_router import ArteryRouter
+import metrics
+import numpy as np
 
 
 class HybridMazeSolver:
-    def __init__(self, maze):
+    # Strategies that route directly, without training a Q-table
+    ROUTING_STRATEGIES = ('astar', 'hierarchical')
+
+    def __init__(self, maze, seed=None):
         self.maze = maze
-        self.slime_solver = SlimeMoldSolver(maze)
+        # Each phase draws from its own stream spawned from seed
+        self.rng = np.random.default_rng(seed)
+        self.slime_solver = SlimeMoldSolver(maze, seed=self.rng.spawn(1)[0])
         self.conductivity = None
         self.final_path = None
+        self.strategy = None
+        self.router = None
 
     # ADD 'training_episodes' parameter here
-    def solve(self, training_episodes=15000):
-        """Execute Smart City Logic"""
-        print(f"Phase 1: Slime Mold Traffic Sensor Network...")
-        self.conductivity = self.slime_solver.solve()
+    @metrics.timed('solve')
+    def solve(self, training_episodes=15000, batch_size=None, strategy='hybrid', warm_start=False,
+              initial_conductivity=None, initial_q_table=None, progress_callback=None,
+              early_stopping=False, random_starts=False):
+        """Execute Smart City Logic
+
+        strategy: 'hybrid' (slime, then Q-learning from sampled episodes),
+        'planned' (slime, then Q-values planned over the known street model;
+        see QLearningSolver.solve_planning), 'astar' (exact route) or
+        'hierarchical' (fast near-exact route over the artery grid; see
+        ArteryRouter).
+        training_episodes=None sizes the budget from the map (episode_budget);
+        early_stopping (True or a ConvergenceMonitor) ends training once the
+        greedy route has settled. random_starts trains from every cell, so
+        policy_field() covers any start (it needs a larger budget).
+
+        initial_conductivity skips Phase 1; initial_q_table continues training
+        from an earlier Q-table (e.g. a cached solve on the same layout).
+        progress_callback(phase, solver, done, total) is forwarded to both
+        phases; returning False from it cancels the solve.
+        """
+        self.strategy = strategy
+        if strategy == 'astar':
+            return self.solve_exact()
+        if strategy == 'hierarchical':
+            return self.solve_hierarchical()
+        if strategy not in ('hybrid', 'planned'):
+            raise ValueError(f"Unknown strategy: {strategy}")
+
+        if initial_conductivity is not None:
+            print(f"Phase 1: Reusing cached Slime Mold conductivity...")
+            self.conductivity = initial_conductivity.copy()
+            self.slime_solver.adopt(self.conductivity)
+        else:
+            print(f"Phase 1: Slime Mold Traffic Sensor Network...")
+            self.slime_solver.progress_callback = progress_callback
+            self.conductivity = self.slime_solver.solve()
+            if self.slime_solver.stopped:
+                return None
 
-        print(f"\nPhase 2: Autonomous Car AI (Training {training_episodes} episodes)...")
+        planning = strategy == 'planned'
+        if training_episodes is None:
+            training_episodes = 0 if planning else episode_budget(self.maze)
+        if planning:
+            print(f"\nPhase 2: Autonomous Car AI (Planning over the street model)...")
+        else:
+            print(f"\nPhase 2: Autonomous Car AI (Training {training_episodes} episodes)...")
 
         # Use the variable instead of hardcoded 15000
         self.rl_solver = QLearningSolver(
             self.maze,
             conductivity_map=self.conductivity,
-            episodes=training_episodes
+            episodes=training_episodes,
+            batch_size=batch_size,
+            progress_callback=progress_callback,
+            early_stopping=early_stopping,
+            random_starts=random_starts,
+            seed=self.rng.spawn(1)[0],
+            planning=planning
         )
 
+        if initial_q_table is not None:
+            self.rl_solver.q_table[:] = initial_q_table
+
+        if warm_start and not planning:
+            # Start from the exact route's values; only light exploration needed
+            print("Warm start: seeding Q-table from exact shortest paths...")
+            with metrics.timer('warm_start'):
+                ShortestPathSolver(self.maze, conductivity_map=self.conductivity).seed_q_table(self.rl_solver)
+            self.rl_solver.epsilon = self.rl_solver.min_epsilon
+
         self.final_path = self.rl_solver.solve()
-        return self.final_path
\ No newline at end of file
+        return self.final_path
+
+    @metrics.timed('astar')
+    def solve_exact(self):
+        """Deterministic A* route over traffic-weighted costs (no training)"""
+        print("Exact Route: A* over traffic-weighted road costs...")
+        # Base conductivity (roads dimmed by traffic) keeps the heatmap layer filled
+        base = self.slime_solver.conductivity
+        self.slime_solver.scale = float(np.max(base))
+        self.conductivity = base / self.slime_solver.scale
+        self.final_path = ShortestPathSolver(self.maze).solve()
+        return self.final_path
+
+    def solve_hierarchical(self):
+        """Route over the artery intersections, refined around start and end (no training)"""
+        print("Fast Route: A* over artery intersections, exact near start and end...")
+        base = self.slime_solver.conductivity
+        self.slime_solver.scale = float(np.max(base))
+        self.conductivity = base / self.slime_solver.scale
+        if self.router is None:
+            self.router = ArteryRouter(self.maze)
+        self.final_path = self.router.solve()
+        return self.final_path
+
+    @metrics.timed('traffic_update')
+    def update_traffic(self, cells, severity, max_backups=None):
+        """Applies a traffic change to the map and refreshes the last solve.
+
+        cells and severity as in CityMap.set_traffic. Only the changed
+        cells' conductivity is rescaled, and only Q-values that depend on
+        them are re-swept (QLearningSolver.sweep), so latency follows the
+        size of the change rather than of the city. max_backups caps the
+        sweep (default: 500 states per changed cell); a capped sweep that
+        leaves the route short of end resumes until it settles.
+        Returns the new route.
+        """
+        changed, before = self.maze.set_traffic(cells, severity)
+        if not len(changed):
+            return self.final_path
+        print(f"⚡ Traffic changed on {len(changed)} cells, refreshing locally...")
+
+        if not self.conductivity.flags.writeable:
+            # A finished result still shows this array: change a copy
+            self.conductivity = self.conductivity.copy()
+            if self.strategy not in self.ROUTING_STRATEGIES:
+                self.rl_solver.conductivity = self.conductivity
+        # In place, so the Q-learner's rewards see the new conductivity too
+        self.slime_solver.conductivity = self.conductivity
+        states = self.slime_solver.update_traffic(changed, before)
+
+        if self.strategy == 'astar':
+            self.final_path = ShortestPathSolver(self.maze).solve()
+            return self.final_path
+        if self.strategy == 'hierarchical':
+            # The map's version moved on, so the router re-costs its segments
+            self.final_path = self.router.solve()
+            return self.final_path
+
+        if max_backups is None:
+            max_backups = 500 * len(changed)
+        done = self.rl_solver.sweep(states, max_backups=max_backups)
+        self.final_path = self.rl_solver.reconstruct_path()
+        if done >= max_backups and self.final_path[-1] != self.maze.end:
+            # Stopped mid-propagation: values around the change disagree
+            self.rl_solver.sweep()
+            self.final_path = self.rl_solver.reconstruct_path()
+        return self.final_path
+
+    def policy_field(self):
+        """Route to maze.end from any start, for the strategy last solved"""
+        if self.strategy in self.ROUTING_STRATEGIES:
+            return PolicyField.exact(self.maze)
+        rl = self.rl_solver
+        # Planning backs values up over every state, random starts train from
+        # every cell; otherwise only the trained route's Q-values settled
+        route = None if rl.planning or rl.random_starts else self.final_path
+        return PolicyField.from_q_table(self.maze, rl.q_table, route=route)
\ No newline at end of file
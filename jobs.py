@@ -0,0 +1,96 @@
+# jobs.py
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Job:
+    def __init__(self, owner=None):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.status = "queued"  # queued -> running -> done | error | cancelled
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.cancel_event = threading.Event()
+        self.future = None
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def update(self, **progress):
+        """Called from the worker thread to publish progress"""
+        self.progress.update(progress)
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": dict(self.progress),
+            "error": self.error,
+            "elapsed": round((self.finished or time.time()) - self.created, 3),
+        }
+
+
+class JobManager:
+    """Bounded worker pool running solves off the request thread.
+
+    fn(job, *args) runs on a worker thread and can report through
+    job.update(...) and check job.cancelled. Finished jobs are kept until
+    max_jobs is exceeded, oldest first.
+    """
+
+    def __init__(self, max_workers=4, max_jobs=1000):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="solver")
+        self.max_workers = max_workers
+        self.max_jobs = max_jobs
+        self.jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, owner=None):
+        job = Job(owner=owner)
+        with self._lock:
+            self.jobs[job.id] = job
+            self._trim()
+        job.future = self.executor.submit(self._run, job, fn, args)
+        return job
+
+    def get(self, job_id, owner=None):
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job is None or (owner is not None and job.owner != owner):
+            return None
+        return job
+
+    def active_count(self):
+        with self._lock:
+            return sum(1 for j in self.jobs.values() if j.status in ("queued", "running"))
+
+    def _run(self, job, fn, args):
+        if job.cancelled:
+            job.status = "cancelled"
+            job.finished = time.time()
+            return None
+        job.status = "running"
+        try:
+            job.result = fn(job, *args)
+            job.status = "cancelled" if job.cancelled else "done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "error"
+        job.finished = time.time()
+        return job.result
+
+    def _trim(self):
+        # Drop the oldest finished jobs once over capacity
+        excess = len(self.jobs) - self.max_jobs
+        for job_id in [k for k, j in self.jobs.items() if j.finished][:max(excess, 0)]:
+            del self.jobs[job_id]
@@ -1,23 +1,207 @@
-# In main.py
+# main.py
+"""Command-line entry point: generate a city, run a solver pipeline, export.
+
+A pipeline is a '+'-separated list of stages run in order:
+
+    slime         SlimeMoldSolver conductivity (rewards Q-learning, seeds ACO)
+    qlearning     QLearningSolver trained on sampled episodes
+    planned       QLearningSolver planning over the known street model
+    aco           AntColonySolver
+    astar         ShortestPathSolver (the exact route)
+    hierarchical  ArteryRouter (fast route over the artery grid)
+
+'hybrid' is short for slime+qlearning, the default. Every routing stage
+reports its route; the last one is exported. Stages draw from streams
+spawned from --seed in order, so slime+qlearning reproduces
+HybridMazeSolver(maze, seed). A per-phase timing summary is printed at the
+end; --profile also runs everything under cProfile and writes the stats
+(open with `python -m pstats FILE` or snakeviz).
+
+    python main.py
+    python main.py --size 201 --seed 7 --pipeline slime+planned --format mzs png
+    python main.py --pipeline slime+aco --ants 64 --iterations 20 --format none --quiet
+    python main.py --size 501 --pipeline hierarchical+astar --profile run.prof
+"""
+import argparse
+import contextlib
+import cProfile
+import io
+import os
+import pstats
+import sys
+import time
+import numpy as np
 from city_generator import CityMap
-from hybrid_solver import HybridMazeSolver
-from exporter import export_simulation  # Import the new function
-
-def main():
-    print("Generating City...")
-    maze = CityMap(width=41, height=41)
-    maze.generate_manhattan_grid()
-
-    print("Solving...")
-    solver = HybridMazeSolver(maze)
-    path = solver.solve()
-
-    if path:
-        print(f"Solution Found! Length: {len(path)}")
-        # REPLACE visualizer calls with this:
-        export_simulation(maze, solver.conductivity, path)
+from slime_mold import SlimeMoldSolver
+from q_learning import QLearningSolver, episode_budget
+from shortest_path import ShortestPathSolver, route_cost
+from artery_router import ArteryRouter
+from ant_colony import AntColonySolver
+from exporter import export_simulation
+from model_store import save_model
+
+STAGES = ('slime', 'qlearning', 'planned', 'aco', 'astar', 'hierarchical')
+ALIASES = {'hybrid': 'slime+qlearning'}
+# Default file name per output format (inside --out-dir)
+FORMATS = {'json': 'traffic_data.json', 'mzs': 'traffic_data.mzs', 'model': 'city_model',
+           'png': 'route.png', 'gif': 'route.gif'}
+
+
+def parse_pipeline(text):
+    """Stage names of a pipeline string such as 'slime+aco'"""
+    stages = []
+    for name in text.lower().split('+'):
+        name = name.strip()
+        stages += ALIASES[name].split('+') if name in ALIASES else [name]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"unknown stage {unknown[0]!r} (choose from {', '.join(STAGES + tuple(ALIASES))})")
+    return stages
+
+
+class PhaseTimer:
+    """Wall time of each named phase, in the order they first ran"""
+
+    def __init__(self):
+        self.seconds = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - began
+
+    def summary(self):
+        total = sum(self.seconds.values()) or 1.0
+        lines = [f"{'phase':<14}{'seconds':>10}{'share':>8}"]
+        for name, seconds in self.seconds.items():
+            lines.append(f"{name:<14}{seconds:>10.3f}{seconds / total:>8.1%}")
+        lines.append(f"{'total':<14}{sum(self.seconds.values()):>10.3f}")
+        return '\n'.join(lines)
+
+
+def run_pipeline(maze, stages, args, timer):
+    """Runs stages on maze; returns (conductivity, q_table, path)"""
+    rng = np.random.default_rng(args.seed)
+    conductivity = q_table = path = None
+    for stage in stages:
+        seed = rng.spawn(1)[0]
+        with timer.phase(stage):
+            if stage == 'slime':
+                print("Phase 1: Slime Mold Traffic Sensor Network...")
+                conductivity = SlimeMoldSolver(maze, max_iters=args.slime_iterations, seed=seed).solve()
+                continue
+            if stage in ('qlearning', 'planned'):
+                planning = stage == 'planned'
+                episodes = 0 if planning else (args.episodes or episode_budget(maze))
+                print(f"Phase 2: Autonomous Car AI ("
+                      f"{'Planning over the street model' if planning else f'Training {episodes} episodes'})...")
+                rl = QLearningSolver(maze, conductivity_map=conductivity, episodes=episodes,
+                                     batch_size=args.batch_size, early_stopping=args.early_stopping,
+                                     seed=seed, planning=planning)
+                path = rl.solve()
+                q_table = rl.q_table
+            elif stage == 'aco':
+                print(f"Ant Colony: {args.ants} ants x {args.iterations} iterations...")
+                path = AntColonySolver(maze, num_ants=args.ants, num_iterations=args.iterations,
+                                       initial_pheromone=conductivity, workers=args.workers, seed=seed).solve()
+            elif stage == 'astar':
+                path = ShortestPathSolver(maze).solve()
+            else:
+                path = ArteryRouter(maze).solve()
+        reached = bool(path) and tuple(path[-1]) == tuple(maze.end)
+        if reached:
+            print(f"🛣️ {stage}: length {len(path)}, cost {route_cost(maze, path):.1f}")
+        else:
+            print(f"⚠️ {stage}: no route to the destination")
+    return conductivity, q_table, path
+
+
+def write_outputs(maze, conductivity, q_table, path, formats, out_dir):
+    for fmt in formats:
+        target = os.path.join(out_dir, FORMATS[fmt])
+        if fmt in ('json', 'mzs'):
+            export_simulation(maze, conductivity, path, filename=target)
+        elif fmt == 'model':
+            # Reusable by the server: MODEL_PATH=city_model python server.py
+            save_model(target, maze, conductivity, q_table, path)
+        else:
+            from visualizer import animate_maze_solution
+            animate_maze_solution(maze, path, conductivity, save_to=target)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a city, solve it and export the result.")
+    city = parser.add_argument_group("city")
+    city.add_argument("--size", type=int, default=41, help="width and height (default: 41)")
+    city.add_argument("--width", type=int, help="overrides --size")
+    city.add_argument("--height", type=int, help="overrides --size")
+    city.add_argument("--seed", type=int, default=None, help="seeds the map and every stage")
+    city.add_argument("--compact", action="store_true", help="uint8/float32 layers for large maps")
+
+    solve = parser.add_argument_group("solver")
+    solve.add_argument("--pipeline", type=parse_pipeline, default="hybrid",
+                       help=f"'+'-separated stages: {', '.join(STAGES)} (default: hybrid = slime+qlearning)")
+    solve.add_argument("--episodes", type=int, default=15000,
+                       help="Q-learning episodes (0: size the budget from the map)")
+    solve.add_argument("--batch-size", type=int, default=None, help="episodes trained per vectorized step")
+    solve.add_argument("--early-stopping", action="store_true", help="stop training once the route settles")
+    solve.add_argument("--slime-iterations", type=int, default=100, help="slime mold iterations")
+    solve.add_argument("--ants", type=int, default=20, help="ACO ants per iteration")
+    solve.add_argument("--iterations", type=int, default=50, help="ACO iterations")
+    solve.add_argument("--workers", type=int, default=None, help="ACO processes (default: one, sequential)")
+
+    out = parser.add_argument_group("output")
+    out.add_argument("--format", nargs="+", choices=tuple(FORMATS) + ("none",), default=["json", "model"],
+                     help="outputs to write (default: json model)")
+    out.add_argument("--out-dir", default=".", help="directory for the outputs")
+    out.add_argument("--quiet", action="store_true", help="hide solver progress, keep the summary")
+    out.add_argument("--profile", metavar="FILE", help="run under cProfile and write the stats to FILE")
+    out.add_argument("--profile-top", type=int, default=20, help="functions listed from the profile")
+    args = parser.parse_args(argv)
+
+    width, height = args.width or args.size, args.height or args.size
+    formats = [] if "none" in args.format else list(dict.fromkeys(args.format))
+    timer = PhaseTimer()
+    profiler = cProfile.Profile() if args.profile else None
+
+    if profiler:
+        profiler.enable()
+    try:
+        with contextlib.redirect_stdout(None) if args.quiet else contextlib.nullcontext():
+            print("Generating City...")
+            with timer.phase("generate"):
+                maze = CityMap(width=width, height=height, compact=args.compact, seed=args.seed)
+                maze.generate_manhattan_grid()
+                maze.transitions  # Build the index here rather than inside the first solver
+            conductivity, q_table, path = run_pipeline(maze, args.pipeline, args, timer)
+            if path and formats:
+                os.makedirs(args.out_dir, exist_ok=True)
+                with timer.phase("export"):
+                    write_outputs(maze, conductivity, q_table, path, formats, args.out_dir)
+    finally:
+        if profiler:
+            profiler.disable()
+
+    reached = bool(path) and tuple(path[-1]) == tuple(maze.end)
+    if reached:
+        print(f"Solution Found! Length: {len(path)}, cost: {route_cost(maze, path):.1f}")
     else:
         print("No solution found!")
+    print(f"\n⏱️ {width}x{height}, pipeline {'+'.join(args.pipeline)}, seed {args.seed}")
+    print(timer.summary())
+
+    if profiler:
+        profiler.dump_stats(args.profile)
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(args.profile_top)
+        print(text.getvalue())
+        print(f"✅ Profile saved to {args.profile}")
+    return 0 if reached else 1
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
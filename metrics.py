@@ -0,0 +1,152 @@
+# metrics.py
+"""Process-wide counters and phase timers, rendered as Prometheus text.
+
+Off by default: every call returns after one flag check, so the solvers stay
+instrumented in batch runs and benchmarks at no measurable cost. Hot loops
+count into local variables and publish once per solve. The server turns
+metrics on (METRICS=0 keeps them off) and serves render() at /metrics.
+
+    metrics.enable()
+    metrics.inc('maze_steps_total', 1500, solver='qlearning')
+    with metrics.timer('warm_start'): ...
+
+    @metrics.timed('slime')
+    def solve(self): ...
+"""
+import contextlib
+import functools
+import threading
+import time
+
+# Histogram bounds in seconds: solves range from cache hits to minutes of training
+BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+HELP = {
+    'maze_phase_seconds': 'Wall time of solver phases',
+    'maze_steps_total': 'Agent moves (ACO: moves of ants that reached the destination)',
+    'maze_episodes_total': 'Finished training episodes (ACO: ants sent out)',
+    'maze_episodes_capped_total': 'Episodes cut off at the step cap before reaching the destination',
+    'maze_wall_collisions_total': 'Moves into a building',
+    'maze_dead_ends_total': 'Ants or agents stuck with no move left',
+    'maze_cache_requests_total': 'Cache lookups by cache and result',
+    'maze_solves_total': 'Solve requests by where the route came from',
+    'maze_sweep_backups_total': 'States processed by prioritized sweeping',
+}
+
+enabled = False
+_lock = threading.Lock()
+_counters = {}  # (name, labels) -> value
+_phases = {}    # phase -> [cumulative bucket counts..., sum, count]
+_NOOP = contextlib.nullcontext()
+
+
+def enable(on=True):
+    global enabled
+    enabled = bool(on)
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _phases.clear()
+
+
+def inc(name, value=1, **labels):
+    """Adds value to a counter"""
+    if not enabled or not value:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(phase, seconds):
+    """Records one run of phase in the maze_phase_seconds histogram"""
+    if not enabled:
+        return
+    with _lock:
+        hist = _phases.get(phase)
+        if hist is None:
+            hist = _phases[phase] = [0] * len(BUCKETS) + [0.0, 0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                hist[i] += 1
+        hist[-2] += seconds
+        hist[-1] += 1
+
+
+class _Timer:
+    def __init__(self, phase):
+        self.phase = phase
+
+    def __enter__(self):
+        self.began = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.phase, time.perf_counter() - self.began)
+
+
+def timer(phase):
+    """Context manager timing one run of phase"""
+    return _Timer(phase) if enabled else _NOOP
+
+
+def timed(phase):
+    """Decorator timing every call of the function as phase"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            began = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(phase, time.perf_counter() - began)
+        return wrapper
+    return decorate
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(gauges=None):
+    """Prometheus text exposition (format 0.0.4) of everything recorded.
+
+    gauges: optional {name: (help, value)} sampled by the caller at scrape
+    time, e.g. cache sizes.
+    """
+    lines = []
+    with _lock:
+        counters = sorted(_counters.items())
+        phases = sorted((phase, list(hist)) for phase, hist in _phases.items())
+
+    if phases:
+        lines += ['# HELP maze_phase_seconds ' + HELP['maze_phase_seconds'],
+                  '# TYPE maze_phase_seconds histogram']
+        for phase, hist in phases:
+            for bound, count in zip(BUCKETS, hist):
+                lines.append(f'maze_phase_seconds_bucket{_labels([("phase", phase), ("le", bound)])} {count}')
+            lines.append(f'maze_phase_seconds_bucket{_labels([("phase", phase), ("le", "+Inf")])} {hist[-1]}')
+            lines.append(f'maze_phase_seconds_sum{_labels([("phase", phase)])} {_number(hist[-2])}')
+            lines.append(f'maze_phase_seconds_count{_labels([("phase", phase)])} {hist[-1]}')
+
+    last = None
+    for (name, labels), value in counters:
+        if name != last:
+            lines += [f'# HELP {name} {HELP.get(name, name)}', f'# TYPE {name} counter']
+            last = name
+        lines.append(f'{name}{_labels(labels)} {_number(value)}')
+
+    for name, (text, value) in sorted((gauges or {}).items()):
+        lines += [f'# HELP {name} {text}', f'# TYPE {name} gauge', f'{name} {_number(value)}']
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,101 @@
+# model_store.py
+"""On-disk city maps and trained solver artifacts.
+
+A model is a directory of plain .npy files plus meta.json:
+
+    meta.json          format, version, width, height, start, end, compact
+    grid.npy           1 = building, 0 = road
+    traffic.npy        traffic_jams
+    conductivity.npy   slime conductivity (optional, state-shaped)
+    q_table.npy        Q-learning table (optional, state-shaped)
+    path.npy           trained route as (row, col) pairs (optional)
+
+.npy files can be opened with np.load(mmap_mode=...), so loading only maps
+the files: pages are read on first touch and shared between processes that
+open the same model read-only.
+"""
+import json
+import os
+import numpy as np
+from city_generator import CityMap
+
+FORMAT = 'maze-model'
+VERSION = 1
+ARRAYS = ('grid', 'traffic', 'conductivity', 'q_table', 'path')
+
+
+def _save_array(directory, name, array):
+    # Write then rename, so a reader never maps a half-written file
+    final = os.path.join(directory, name + '.npy')
+    tmp = final + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.save(f, np.ascontiguousarray(array))
+    os.replace(tmp, final)
+
+
+def save_model(directory, maze, conductivity=None, q_table=None, path=None):
+    """Writes the map and whichever artifacts are given to directory"""
+    os.makedirs(directory, exist_ok=True)
+    arrays = {
+        'grid': maze.grid,
+        'traffic': maze.traffic_jams,
+        'conductivity': conductivity,
+        'q_table': q_table,
+        'path': None if not path else np.asarray(path, dtype=np.int32).reshape(-1, 2),
+    }
+    for name, array in arrays.items():
+        target = os.path.join(directory, name + '.npy')
+        if array is not None:
+            _save_array(directory, name, array)
+        elif os.path.exists(target):
+            os.remove(target)  # Stale artifact from an earlier save
+
+    meta = {
+        'format': FORMAT,
+        'version': VERSION,
+        'width': maze.width,
+        'height': maze.height,
+        'start': list(maze.start),
+        'end': list(maze.end),
+        'compact': bool(maze.compact),
+    }
+    # meta.json goes last: its presence marks a complete model
+    tmp = os.path.join(directory, 'meta.json.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(directory, 'meta.json'))
+    print(f"✅ Model saved to {directory}")
+
+
+def load_model(directory, mmap_mode='r'):
+    """Opens a saved model; arrays are memory-mapped unless mmap_mode is None.
+
+    Returns a dict with the CityMap ('maze'), 'conductivity', 'q_table' and
+    'path' (None when not saved) and the raw 'meta'. The default read-only
+    mapping suits shared serving: maze.snapshot() gives each session or job
+    a copy that shares the mapped layers and the index. Use mmap_mode='c'
+    for private copy-on-write edits.
+    """
+    with open(os.path.join(directory, 'meta.json')) as f:
+        meta = json.load(f)
+    if meta.get('format') != FORMAT or meta.get('version') != VERSION:
+        raise ValueError(f"Not a {FORMAT} v{VERSION} directory: {directory}")
+
+    arrays = {}
+    for name in ARRAYS:
+        filename = os.path.join(directory, name + '.npy')
+        arrays[name] = np.load(filename, mmap_mode=mmap_mode) if os.path.exists(filename) else None
+
+    maze = CityMap(width=meta['width'], height=meta['height'], compact=meta['compact'],
+                   layers=(arrays['grid'], arrays['traffic']))
+    maze.start = tuple(meta['start'])
+    maze.end = tuple(meta['end'])
+
+    path = arrays['path']
+    return {
+        'maze': maze,
+        'conductivity': arrays['conductivity'],
+        'q_table': arrays['q_table'],
+        'path': None if path is None else [tuple(int(v) for v in p) for p in path],
+        'meta': meta,
+    }
@@ -0,0 +1,165 @@
+# policy.py
+import threading
+from collections import OrderedDict
+import numpy as np
+import metrics
+from shortest_path import ShortestPathSolver
+from solution_cache import SolutionCache
+
+
+class PolicyField:
+    """Routes to one destination from every cell.
+
+    Holds the action each state takes toward maze.end (-1 where it has
+    none), so a route from any start is a greedy walk costing O(path
+    length). Built exactly from Dijkstra (exact) or read off a trained
+    Q-table (from_q_table). Only the arrays a walk needs are kept, not the
+    maze, so a cached field does not pin the map it was built on.
+    """
+
+    def __init__(self, maze, next_action, values=None):
+        self.height, self.width = maze.height, maze.width
+        self.end = tuple(maze.end)
+        self.goal = maze.state_index(self.end)
+        # Compact maps: flat cell of every road id (sorted, so lookups bisect)
+        self.cells = maze.state_cells if maze.compact else None
+        self.next_action = np.asarray(next_action).reshape(-1)
+        self.values = values  # cost-to-go (exact) or max Q (trained), state-shaped
+
+        # Successor state of every state under the policy (-1: no move)
+        has_move = self.next_action >= 0
+        rows = np.arange(len(self.next_action))
+        succ = np.full(len(self.next_action), -1, dtype=np.int64)
+        succ[has_move] = maze.transitions[rows[has_move], self.next_action[has_move]]
+        self.successor = succ
+        self._succ = memoryview(succ)
+
+    @classmethod
+    def exact(cls, maze, conductivity=None):
+        """Shortest routes to end over traffic-weighted costs (ShortestPathSolver)"""
+        cost_to_go, _, next_action = ShortestPathSolver(maze, conductivity_map=conductivity).solve_all()
+        return cls(maze, next_action, values=cost_to_go)
+
+    @classmethod
+    def from_q_table(cls, maze, q_table, route=None):
+        """Greedy policy of a Q-table trained toward maze.end.
+
+        route: the (x, y) cells training settled, e.g. the trained route
+        when every episode began at maze.start. Other states get no move,
+        since their Q-values were barely visited. None covers every state.
+        """
+        q = np.asarray(q_table).reshape(-1, 4)
+        best = q.argmax(axis=1)
+        # Never step into a wall, even where the Q-table prefers it
+        best[~maze.action_mask[np.arange(len(q)), best]] = -1
+        if route is not None:
+            cells = np.asarray(route, dtype=int).reshape(-1, 2)
+            covered = np.zeros(len(q), dtype=bool)
+            covered[maze.state_indices(cells[:, 0], cells[:, 1])] = True
+            best[~covered] = -1
+        best[maze.state_index(maze.end)] = -1
+        return cls(maze, best, values=q.max(axis=1).reshape(maze.state_shape))
+
+    def _state(self, x, y):
+        cell = x * self.width + y
+        if self.cells is None:
+            return cell
+        i = int(np.searchsorted(self.cells, cell))
+        return i if i < len(self.cells) and self.cells[i] == cell else -1
+
+    def _pos(self, state):
+        return divmod(int(state if self.cells is None else self.cells[state]), self.width)
+
+    def route(self, start):
+        """Route from start to end as (x, y) cells; [] if the policy does not get there"""
+        x, y = start
+        if not (0 <= x < self.height and 0 <= y < self.width):
+            return []
+        state = self._state(x, y)
+        if state < 0:
+            return []  # A building on a compact map
+        path = [tuple(start)]
+        seen = {state}
+        while state != self.goal:
+            state = self._succ[state]
+            if state < 0 or state in seen:
+                return []  # Dead end or loop: this start is not covered
+            seen.add(state)
+            path.append(self._pos(state))
+        return path
+
+    @property
+    def nbytes(self):
+        values = 0 if self.values is None else np.asarray(self.values).nbytes
+        cells = 0 if self.cells is None else self.cells.nbytes
+        return self.next_action.nbytes + self.successor.nbytes + values + cells
+
+
+class PolicyCache:
+    """LRU of per-destination PolicyFields under a memory budget.
+
+    Keyed by layout fingerprint, solver parameters and end (not start), so
+    every start on the same map and destination shares one field. Entries
+    may carry the conductivity shown alongside the route. Safe to share
+    between request threads.
+    """
+
+    def __init__(self, max_bytes=32 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(maze, params=None):
+        return f"{SolutionCache.map_key(maze, params)}:{maze.end[0]},{maze.end[1]}"
+
+    def get(self, maze, params=None):
+        """Entry {'field', 'conductivity'} for this layout and end (or None)"""
+        key = self.key(maze, params)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                metrics.inc('maze_cache_requests_total', cache='policy', result='miss')
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            metrics.inc('maze_cache_requests_total', cache='policy', result='hit')
+            return entry
+
+    def route(self, maze, params=None):
+        """(path, entry) from the cached field for maze.start, or (None, entry)
+
+        (None, entry) means the field does not cover maze.start.
+        """
+        entry = self.get(maze, params)
+        if entry is None:
+            return None, None
+        path = entry["field"].route(maze.start)
+        return (path or None), entry
+
+    def put(self, maze, params, field, conductivity=None):
+        key = self.key(maze, params)
+        entry = {"field": field,
+                 "conductivity": None if conductivity is None else np.array(conductivity)}
+        entry["nbytes"] = field.nbytes + (0 if conductivity is None else entry["conductivity"].nbytes)
+
+        with self._lock:
+            if key in self.entries:
+                self.used_bytes -= self.entries.pop(key)["nbytes"]
+            if entry["nbytes"] > self.max_bytes:
+                return None
+            self.entries[key] = entry
+            self.used_bytes += entry["nbytes"]
+            while self.used_bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.used_bytes -= evicted["nbytes"]
+            return entry
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.used_bytes = 0
@@ -1,11 +1,59 @@
 # q_learning.py
+import heapq
 import numpy as np
-import random
 import time
+import metrics
+
+# Action that undoes each of CityMap.ACTIONS (up, down, left, right)
+OPPOSITE = np.array([1, 0, 3, 2])
+
+
+def episode_budget(maze, episodes_per_cell=12, minimum=1000, maximum=50000):
+    """Training episodes scaled to the number of road cells reachable from start"""
+    cells = int(maze.reachable().sum())
+    return int(min(max(cells * episodes_per_cell, minimum), maximum))
+
+
+class ConvergenceMonitor:
+    """Early-stopping rule, checked each time the solver reports progress.
+
+    Training has converged once the greedy path reaches end and stays the
+    same for `patience` checks in a row, or once no Q-value moved by more
+    than `tol` since the previous check.
+    """
+
+    def __init__(self, patience=4, tol=1e-3):
+        self.patience = patience
+        self.tol = tol
+        self.reset()
+
+    def reset(self):
+        self.last_path = None
+        self.last_q = None
+        self.stable_checks = 0
+        self.q_delta = float('inf')
+
+    def update(self, solver):
+        """Returns True once training can stop"""
+        path = solver.reconstruct_path()
+        if path[-1] == solver.maze.end and path == self.last_path:
+            self.stable_checks += 1
+        else:
+            self.stable_checks = 0
+        self.last_path = path
+
+        if self.tol is not None:
+            if self.last_q is not None:
+                self.q_delta = float(np.abs(solver.q_table - self.last_q).max())
+            self.last_q = solver.q_table.copy()
+
+        return self.stable_checks >= self.patience or self.q_delta < (self.tol or 0)
 
 
 class QLearningSolver:
-    def __init__(self, maze, conductivity_map=None, episodes=5000, alpha=0.1, gamma=0.95):
+    def __init__(self, maze, conductivity_map=None, episodes=5000, alpha=0.1, gamma=0.95,
+                 batch_size=None, progress_callback=None, progress_every=250, early_stopping=None,
+                 random_starts=False, seed=None, planning=False):
         self.maze = maze
         self.conductivity = conductivity_map
         self.episodes = episodes
@@ -14,86 +62,355 @@ class QLearningSolver:
         self.epsilon = 1.0
         self.epsilon_decay = 0.9992
         self.min_epsilon = 0.05
-        self.q_table = np.zeros((maze.height, maze.width, 4))
+        # One row of action values per state: (H, W, 4), or (roads, 4) float32
+        # on a compact map
+        self.q_table = np.zeros(maze.state_shape + (4,), dtype=maze.dtype)
         self.actions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+        # Batched mode: number of agents stepped together per training round
+        self.batch_size = batch_size
+        self.max_steps = 1500
+        self.wall_penalty = -50
+        # progress_callback(phase, solver, done, total) every progress_every
+        # episodes; returning False stops training early
+        self.progress_callback = progress_callback
+        self.progress_every = progress_every
+        self.episodes_done = 0
+        self.stopped = False
+        # early_stopping: True or a ConvergenceMonitor, checked at every
+        # progress report; converged is set when it ends training
+        self.monitor = ConvergenceMonitor() if early_stopping is True else early_stopping or None
+        self.converged = False
+        # random_starts: episodes begin anywhere connected to end, so the
+        # Q-table holds a route from every cell (see policy.PolicyField)
+        self.random_starts = random_starts
+        self._start_pool = None
+        # States a capped sweep() left queued: {state: priority}
+        self.pending_sweep = {}
+        # seed: int, SeedSequence or np.random.Generator
+        self.rng = np.random.default_rng(seed)
+        # planning: solve() plans over the known model (solve_planning)
+        # instead of sampling episodes; backups counts the states it processed
+        self.planning = planning
+        self.backups = 0
+        # reconstruct_path's walk buffer and visited map, reused between calls
+        self._path = None
+        self._seen = None
+
+    def report_progress(self, done):
+        """Publishes progress; returns False when training should stop"""
+        self.episodes_done = done
+        if self.progress_callback is not None:
+            if self.progress_callback('qlearning', self, done, self.episodes) is False:
+                self.stopped = True
+                return False
+        if self.monitor is not None and done < self.episodes and self.monitor.update(self):
+            print(f"Converged after {done} episodes.")
+            self.converged = True
+            return False
+        return True
+
+    def start_states(self, n):
+        """States n new episodes begin in"""
+        if not self.random_starts:
+            return np.full(n, self.maze.state_index(self.maze.start))
+        if self._start_pool is None:
+            connected = self.maze.state_values(self.maze.reachable(self.maze.end)).reshape(-1)
+            connected[self.maze.state_index(self.maze.end)] = False
+            self._start_pool = np.flatnonzero(connected)
+        return self._start_pool[self.rng.integers(0, len(self._start_pool), size=n)]
 
     def get_valid_actions(self, pos):
-        valid = []
-        x, y = pos
-        for idx, (dx, dy) in enumerate(self.actions):
-            nx, ny = x + dx, y + dy
-            if self.maze.is_valid(nx, ny):
-                valid.append(idx)
-        return valid
-
-    def get_reward(self, current_pos, next_pos):
-        if next_pos == self.maze.end: return 1000
-        reward = -1
-        # Traffic
-        if hasattr(self.maze, 'traffic_jams'):
-            sev = self.maze.traffic_jams[next_pos[0], next_pos[1]]
-            if sev > 0: reward -= (sev * 2)
-        # Slime
+        return self.maze.valid_actions(pos)
+
+    def build_tables(self):
+        """Reward table over the maze's precomputed (states, 4) transition index"""
+        next_state = self.maze.transitions
+        valid = self.maze.action_mask
+
+        # -1 per step, -2 per unit of traffic entered, +/-0.5 for Manhattan
+        # progress toward end, +2 per unit of conductivity entered
+        rewards = -1.0 - self.maze.traffic_cost * 2 + self.maze.goal_progress * 0.5
         if self.conductivity is not None:
-            reward += self.conductivity[next_pos[0], next_pos[1]] * 2
-        # Heuristic (Compass)
-        goal = self.maze.end
-        curr_dist = abs(current_pos[0] - goal[0]) + abs(current_pos[1] - goal[1])
-        next_dist = abs(next_pos[0] - goal[0]) + abs(next_pos[1] - goal[1])
-        if next_dist < curr_dist:
-            reward += 0.5
-        else:
-            reward -= 0.5
-        return reward
+            rewards += self.conductivity.ravel()[next_state] * 2
+        rewards[next_state == self.maze.state_index(self.maze.end)] = 1000
+        rewards[~valid] = self.wall_penalty
+
+        return next_state, valid, rewards
+
+    def entry_rewards(self, states, actions, targets):
+        """build_tables' rewards for the moves (states, actions) into targets.
+
+        Vectorized over valid moves only, without building the full table.
+        """
+        maze = self.maze
+        sx, sy = np.divmod(maze.cells_of(states), maze.width)
+        tx, ty = np.divmod(maze.cells_of(targets), maze.width)
+        gx, gy = maze.end
+        closer = np.abs(tx - gx) + np.abs(ty - gy) < np.abs(sx - gx) + np.abs(sy - gy)
+        rewards = -1.0 - np.maximum(maze.traffic_jams[tx, ty], 0) * 2 + np.where(closer, 0.5, -0.5)
+        if self.conductivity is not None:
+            rewards += self.conductivity.ravel()[targets] * 2
+        rewards[targets == maze.state_index(maze.end)] = 1000
+        return rewards
+
+    def sweep(self, states=(), max_backups=None, theta=1e-2, batch=64):
+        """Prioritized sweeping over the maze's deterministic model.
+
+        states: states whose entry reward or value changed. Processing a
+        state backs up every road move of its road neighbours (the states
+        that can enter it); a neighbour whose value moves by more than
+        theta is queued in turn, largest change first (batch states at a
+        time). Runs until the queue drains or max_backups states were
+        processed, so the work follows the size of the change; what is
+        left stays in pending_sweep and a later sweep() resumes it.
+        Returns the number of states processed.
+        """
+        maze = self.maze
+        q = self.q_table.reshape(-1, 4)
+        goal = maze.state_index(maze.end)
+        budget = float('inf') if max_backups is None else max_backups
+        queued = self.pending_sweep
+        for s in np.unique(np.asarray(states, dtype=np.int64).reshape(-1)).tolist():
+            queued[s] = float('inf')
+        heap = [(-p, s) for s, p in queued.items()]
+        heapq.heapify(heap)
+        done = 0
+
+        while heap and done < budget:
+            picked = []
+            while heap and len(picked) < min(batch, budget - done):
+                _, s = heapq.heappop(heap)
+                if queued.pop(s, None) is not None:  # Skip stale heap entries
+                    picked.append(s)
+            if not picked:
+                break
+            done += len(picked)
+
+            # 1. Predecessors: each road neighbour reaches s with the opposite move
+            into = np.array(picked)
+            moves = maze.action_mask[into]
+            preds = maze.transitions[into][moves]
+            actions = OPPOSITE[np.nonzero(moves)[1]]
+            into = np.repeat(into, moves.sum(axis=1))
+            keep = preds != goal  # Episodes end at the goal; its row is never used
+            preds, actions, into = preds[keep], actions[keep], into[keep]
 
+            # 2. Exact backups of every road move of those predecessors
+            preds = np.unique(preds)
+            before = q[preds].max(axis=1)
+            ok = maze.action_mask[preds]
+            rows, acts = np.nonzero(ok)
+            src = preds[rows]
+            dst = maze.transitions[src, acts]
+            q[src, acts] = self.entry_rewards(src, acts, dst) + self.gamma * q[dst].max(axis=1)
+            change = np.abs(q[preds].max(axis=1) - before)
+
+            # 3. Queue the neighbours whose value moved
+            for s, c in zip(preds[change > theta].tolist(), change[change > theta].tolist()):
+                if c > queued.get(s, 0.0):
+                    queued[s] = c
+                    heapq.heappush(heap, (-c, s))
+
+        metrics.inc('maze_sweep_backups_total', done)
+        return done
+
+    def record_metrics(self, steps, collisions, capped):
+        """Publishes one solve's counters (no-op unless metrics are enabled)"""
+        metrics.inc('maze_episodes_total', self.episodes_done, solver='qlearning')
+        metrics.inc('maze_steps_total', steps, solver='qlearning')
+        metrics.inc('maze_wall_collisions_total', collisions, solver='qlearning')
+        metrics.inc('maze_episodes_capped_total', capped, solver='qlearning')
+
+    @metrics.timed('qlearning')
     def solve(self):
+        if self.planning:
+            return self.solve_planning()
+        if self.monitor is not None:
+            self.monitor.reset()
+        if self.maze.state_index(self.maze.start) < 0 and not self.random_starts:
+            # A building on a compact map has no state to train from
+            print("Start is not on a road, nothing to train.")
+            return self.reconstruct_path()
+        if self.batch_size:
+            return self.solve_batched()
+
         print(f"TRAINING AI ({self.episodes} episodes)...")
+        next_state, valid_mask, rewards = self.build_tables()
+        q = self.q_table.reshape(-1, 4)
+        total_steps = collisions = capped = 0
         for episode in range(1, self.episodes + 1):
-            current = self.maze.start
+            current = self.maze.state_pos(self.start_states(1)[0]) if self.random_starts else self.maze.start
             steps = 0
-            while current != self.maze.end and steps < 1500:
-                x, y = current
-                if random.random() < self.epsilon:
+            while current != self.maze.end and steps < self.max_steps:
+                state = self.maze.state_index(current)
+                if self.rng.random() < self.epsilon:
                     valid = self.get_valid_actions(current)
                     if not valid: break
-                    idx = random.choice(valid)
+                    idx = valid[int(self.rng.random() * len(valid))]
                 else:
-                    idx = np.argmax(self.q_table[x, y] + np.random.randn(4) * 1e-5)
-
-                dx, dy = self.actions[idx]
-                next_pos = (x + dx, y + dy)
+                    idx = np.argmax(q[state] + self.rng.standard_normal(4) * 1e-5)
 
-                if not self.maze.is_valid(next_pos[0], next_pos[1]):
+                if not valid_mask[state, idx]:
                     # Hit building
-                    self.q_table[x, y, idx] = (1 - self.alpha) * self.q_table[x, y, idx] + self.alpha * -50
+                    collisions += 1
+                    q[state, idx] = (1 - self.alpha) * q[state, idx] + self.alpha * self.wall_penalty
                     continue
 
-                reward = self.get_reward(current, next_pos)
-                nx, ny = next_pos
-                max_q = np.max(self.q_table[nx, ny])
-                curr_q = self.q_table[x, y, idx]
-                self.q_table[x, y, idx] = curr_q + self.alpha * (reward + self.gamma * max_q - curr_q)
+                reward = rewards[state, idx]
+                nxt = next_state[state, idx]
+                next_pos = self.maze.state_pos(nxt)
+                max_q = np.max(q[nxt])
+                curr_q = q[state, idx]
+                q[state, idx] = curr_q + self.alpha * (reward + self.gamma * max_q - curr_q)
 
                 current = next_pos
                 steps += 1
 
+            total_steps += steps
+            capped += steps >= self.max_steps and current != self.maze.end
             if self.epsilon > self.min_epsilon:
                 self.epsilon *= self.epsilon_decay
 
+            if episode % self.progress_every == 0 or episode == self.episodes:
+                if not self.report_progress(episode):
+                    break
+
+        self.record_metrics(total_steps, collisions, capped)
+        return self.reconstruct_path()
+
+    def solve_batched(self):
+        """Trains batch_size agents at once with array operations"""
+        print(f"TRAINING AI ({self.episodes} episodes, batches of {self.batch_size})...")
+        next_state, valid, rewards = self.build_tables()
+        start = self.maze.state_index(self.maze.start)
+        goal = self.maze.state_index(self.maze.end)
+        has_moves = valid.any(axis=1)
+
+        # Flat views share memory with the q_table
+        q = self.q_table.reshape(-1, 4)
+        q_flat = q.reshape(-1)
+
+        # Each slot runs one episode at a time; a finished slot immediately
+        # starts the next episode so no agent waits for the slowest one
+        started = min(self.batch_size, self.episodes) if start != goal else 0
+        states = self.start_states(started)
+        steps = np.zeros(started, dtype=int)
+        completed = 0
+        next_report = self.progress_every
+        # Counters stay local; the wall and cap counts cost a reduction per
+        # round, so they are only taken when metrics are on
+        counting = metrics.enabled
+        total_steps = collisions = capped = 0
+
+        while len(states):
+            # 1. Epsilon-greedy: one random draw serves both the random
+            # valid action and the argmax tie-break noise
+            noise = self.rng.random((len(states), 4))
+            explore = self.rng.random(len(states)) < self.epsilon
+            greedy = (q[states] + noise * 1e-5).argmax(axis=1)
+            random_pick = np.where(valid[states], noise, -1.0).argmax(axis=1)
+            actions = np.where(explore, random_pick, greedy)
+            stuck = explore & ~has_moves[states]
+
+            # 2. Targets: walls pull toward the penalty, roads bootstrap
+            s_next = next_state[states, actions]
+            target = rewards[states, actions] + self.gamma * q[s_next].max(axis=1)
+            walls = ~valid[states, actions]
+            target[walls] = self.wall_penalty
+            total_steps += len(states)
+            if counting:
+                collisions += int(np.count_nonzero(walls))
+
+            # 3. Scatter the updates. Transitions are deterministic, so agents
+            # sharing a (cell, action) pair write the same value.
+            idx = states * 4 + actions
+            q_flat[idx] += self.alpha * (target - q_flat[idx])
+
+            # 4. Finish episodes at the goal, the step cap, or a dead end
+            states = s_next
+            steps += 1
+            done = (states == goal) | (steps >= self.max_steps) | stuck
+            finished = int(done.sum())
+            if not finished:
+                continue
+
+            if counting:
+                capped += int(np.count_nonzero((steps >= self.max_steps) & (states != goal)))
+            if self.epsilon > self.min_epsilon:
+                self.epsilon = max(self.epsilon * self.epsilon_decay ** finished, self.min_epsilon)
+
+            completed += finished
+            if completed >= next_report or completed == self.episodes:
+                next_report = completed + self.progress_every
+                if not self.report_progress(completed):
+                    break
+
+            restart = np.flatnonzero(done)[:self.episodes - started]
+            started += len(restart)
+            states[restart] = self.start_states(len(restart))
+            steps[restart] = 0
+            done[restart] = False
+            if done.any():
+                states, steps = states[~done], steps[~done]
+
+        self.record_metrics(total_steps, collisions, capped)
+        return self.reconstruct_path()
+
+    def solve_planning(self):
+        """Model-based alternative to training: no episodes are sampled.
+
+        The transition model and rewards are known (build_tables), so
+        values are propagated backward from maze.end by prioritized
+        sweeping. Road moves start at a lower bound on their return and
+        walls at the wall penalty, so values only rise as the destination's
+        value spreads. The Q-table keeps the format training produces.
+        Like training, it cannot see past the discount horizon: hundreds of
+        steps out, the goal's discounted reward is smaller than what
+        circling between high-conductivity cells collects.
+        """
+        print("PLANNING AI (prioritized sweeping back from the destination)...")
+        _, valid, rewards = self.build_tables()
+        q = self.q_table.reshape(-1, 4)
+        floor = min(float(rewards[valid].min()), 0.0) / (1 - self.gamma)
+        q[:] = np.where(valid, floor, self.wall_penalty)
+        goal = self.maze.state_index(self.maze.end)
+        q[goal] = 0  # Episodes end at the goal, so training never fills its row
+
+        self.pending_sweep = {}
+        self.backups = self.sweep([goal])
+        print(f"Planned with {self.backups} state backups.")
         return self.reconstruct_path()
 
     def reconstruct_path(self):
-        path = [self.maze.start]
-        current = self.maze.start
-        visited = set([current])
-        while current != self.maze.end:
-            x, y = current
-            idx = np.argmax(self.q_table[x, y])
-            dx, dy = self.actions[idx]
-            next_pos = (x + dx, y + dy)
-            if next_pos in visited or not self.maze.is_valid(next_pos[0], next_pos[1]): break
-            path.append(next_pos)
-            visited.add(next_pos)
-            current = next_pos
-            if len(path) > 1500: break
-        return path
\ No newline at end of file
+        """Greedy route from start as (x, y) cells.
+
+        Stops at end, at a wall, on a revisit (a loop) or after max_steps
+        moves. States are walked in a preallocated int32 buffer against a
+        visited map kept between calls; cells are built once at the end.
+        """
+        maze = self.maze
+        size = maze.num_states
+        if self._path is None or len(self._path) != self.max_steps + 1 or len(self._seen) != size:
+            self._path = np.empty(self.max_steps + 1, dtype=np.int32)
+            self._seen = np.zeros(size, dtype=bool)
+        path, seen = self._path, self._seen
+        q = self.q_table.reshape(-1, 4)
+        trans = memoryview(maze.transitions.reshape(-1))
+        mask = memoryview(maze.action_mask.reshape(-1))
+        current, goal = maze.state_index(maze.start), maze.state_index(maze.end)
+        if current < 0:
+            return [maze.start]  # A building on a compact map has no state
+        path[0] = current
+        seen[current] = True
+        n = 1
+        while current != goal and n <= self.max_steps:
+            move = current * 4 + int(q[current].argmax())
+            if not mask[move] or seen[trans[move]]:
+                break
+            current = trans[move]
+            path[n] = current
+            seen[current] = True
+            n += 1
+        seen[path[:n]] = False  # Clear only this walk's visits
+        xs, ys = np.divmod(maze.cells_of(path[:n]), maze.width)
+        return list(zip(xs.tolist(), ys.tolist()))
\ No newline at end of file
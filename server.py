@@ -1,13 +1,71 @@
 # server.py
-from flask import Flask, jsonify, send_from_directory, request
+from flask import Flask, Response, jsonify, send_from_directory, request, session, stream_with_context
 from city_generator import CityMap
 from hybrid_solver import HybridMazeSolver
+from q_learning import QLearningSolver, episode_budget
+from shortest_path import ShortestPathSolver
+from solution_cache import SolutionCache
+from policy import PolicyCache
+from jobs import JobManager
+import metrics
+import model_store
+import wire_format
+from collections import OrderedDict
 import numpy as np
+import base64
+import contextlib
+import gzip
+import json
+import os
+import queue
+import threading
+import uuid
+import zlib
+try:
+    import brotli  # Optional: 'br' responses when installed
+except ImportError:
+    brotli = None
 
 app = Flask(__name__, static_url_path='', static_folder='.')
+# Signs the session cookie that ties a browser to its own map
+app.secret_key = os.environ.get('SECRET_KEY') or os.urandom(24)
 
-# Global maze to persist state between clicks
-current_maze = None
+# Per-session mazes (least recently used sessions are dropped first)
+MAX_SESSIONS = int(os.environ.get('MAX_SESSIONS', 256))
+session_mazes = OrderedDict()
+session_lock = threading.Lock()
+# Each session's last fresh solve, kept so /traffic can refresh it in place
+session_solvers = {}
+
+# Solves run on a bounded pool so one long training run does not block other users
+job_manager = JobManager(max_workers=int(os.environ.get('SOLVER_WORKERS', 4)))
+
+# Solve results keyed by layout + start/end + solver settings
+solution_cache = SolutionCache(max_bytes=int(os.environ.get('SOLUTION_CACHE_MB', 64)) * 2 ** 20)
+
+# Per-destination policies: a new start on a solved map and end is one greedy walk
+policy_cache = PolicyCache(max_bytes=int(os.environ.get('POLICY_CACHE_MB', 32)) * 2 ** 20)
+
+# Optional pre-trained model (see model_store). It is memory-mapped read-only,
+# so every worker process serving it shares the same pages.
+MODEL_PATH = os.environ.get('MODEL_PATH')
+shared_model = model_store.load_model(MODEL_PATH) if MODEL_PATH else None
+if shared_model is not None:
+    shared_model['key'] = SolutionCache.map_key(shared_model['maze'])
+    shared_model['maze'].num_states  # Build the index once; session copies share it
+    print(f"⚡ Serving shared model from {MODEL_PATH}")
+
+# Solver timings and counters for /metrics; METRICS=0 turns them off
+metrics.enable(os.environ.get('METRICS', '1') != '0')
+
+# Layers recently sent, by ETag, so the next response can carry just a delta
+# against what the client holds (see wire_format.json_payload)
+SENT_LAYERS_MAX_BYTES = int(os.environ.get('SENT_LAYERS_MB', 32)) * 2 ** 20
+sent_layers = wire_format.LayerStore(SENT_LAYERS_MAX_BYTES)
+
+# Responses smaller than this are not worth compressing
+COMPRESS_MIN_BYTES = 1024
+COMPRESSIBLE = ('application/json', 'text/plain', 'text/html', wire_format.MIME_TYPE)
 
 
 @app.route('/')
@@ -15,59 +73,509 @@ def home():
     return send_from_directory('.', 'index.html')
 
 
-# server.py (Partial Update - Replace the generate_simulation function)
+def current_session_id():
+    if 'sid' not in session:
+        session['sid'] = uuid.uuid4().hex
+    return session['sid']
 
-@app.route('/generate', methods=['POST'])
-def generate_simulation():
-    global current_maze
 
-    data = request.json
+def prepare_solve(sid, data):
+    """Updates the session's map from the request and returns (maze snapshot, settings)"""
     new_map = data.get('new_map', True)
     start_pos = data.get('start', [1, 1])
     end_pos = data.get('end', [39, 39])
+    # 'hybrid' (slime + RL), 'planned' (slime + model-based RL), 'astar' (exact)
+    # or 'hierarchical' (fast route over the arteries)
+    strategy = data.get('strategy', 'hybrid')
+    warm_start = data.get('warm_start', False)
+    seed = data.get('seed')  # Optional: reproducible city and training run
 
-    # LOGIC: Define how much "thinking" the AI needs to do
-    ai_episodes = 10000  # Default for new maps
+    if strategy not in ('hybrid', 'planned') + HybridMazeSolver.ROUTING_STRATEGIES:
+        raise ValueError(f"Unknown strategy: {strategy}")
 
-    if new_map or current_maze is None:
-        print("⚡ Generating NEW City Layout...")
-        current_maze = CityMap(width=41, height=41)
-        current_maze.generate_manhattan_grid()
-    else:
-        # If just recalculating, use fewer episodes for speed
-        print("⚡ Recalculating on existing map (Fast Mode)...")
-        ai_episodes = 2500
+    ai_batch_size = 128  # Agents trained side by side per step
+    recalculating = False
+
+    with session_lock:
+        current_maze = session_mazes.get(sid)
+        if (new_map or current_maze is None) and shared_model is not None:
+            print("⚡ Opening shared City Layout...")
+            # Own start/end; the read-only layers and the index stay shared
+            current_maze = shared_model['maze'].snapshot()
+            session_mazes[sid] = current_maze
+        elif new_map or current_maze is None:
+            print("⚡ Generating NEW City Layout...")
+            current_maze = CityMap(width=41, height=41, seed=seed)
+            current_maze.generate_manhattan_grid()
+            session_mazes[sid] = current_maze
+        else:
+            # If just recalculating, use fewer episodes for speed
+            print("⚡ Recalculating on existing map (Fast Mode)...")
+            recalculating = True
+        session_mazes.move_to_end(sid)
+        while len(session_mazes) > MAX_SESSIONS:
+            evicted, _ = session_mazes.popitem(last=False)
+            session_solvers.pop(evicted, None)
 
         # Update Start/End
-    if current_maze.grid[start_pos[0], start_pos[1]] == 1:
-        print("Warning: Start point is inside a building.")
-    else:
-        current_maze.start = tuple(start_pos)
+        if current_maze.grid[start_pos[0], start_pos[1]] == 1:
+            print("Warning: Start point is inside a building.")
+        else:
+            current_maze.start = tuple(start_pos)
+
+        if current_maze.grid[end_pos[0], end_pos[1]] == 1:
+            print("Warning: End point is inside a building.")
+        else:
+            current_maze.end = tuple(end_pos)
+
+        # The job solves a private copy, so later clicks cannot change it mid-run
+        maze = current_maze.snapshot()
+        session_map = current_maze
+
+    # LOGIC: Define how much "thinking" the AI needs to do. The budget grows
+    # with the road network; training also stops early once the route settles.
+    ai_episodes = episode_budget(maze)
+    if recalculating:
+        ai_episodes = ai_episodes // 4
+
+    if warm_start:
+        # A Q-table seeded from the exact route needs far less exploration
+        ai_episodes = ai_episodes // 5
+
+    settings = {"strategy": strategy, "warm_start": warm_start,
+                "episodes": ai_episodes, "batch_size": ai_batch_size, "seed": seed,
+                "binary": data.get('format') == 'binary', "session_map": session_map}
+    return maze, settings
+
+
+def progress_event(phase, solver, done, total, binary=False):
+    """Snapshot of a running phase for the live stream"""
+    if phase == 'slime':
+        # Road-only conductivity of a compact map goes back onto the full grid
+        conductivity = solver.maze.to_grid(solver.conductivity)
+        conductivity = conductivity / max(np.max(conductivity), 1e-12)
+        if binary:
+            # Quantized to uint8, base64 because SSE is a text protocol
+            packed = np.rint(np.clip(conductivity, 0, 1) * 255).astype(np.uint8).tobytes()
+            return {"phase": phase, "done": done, "total": total,
+                    "conductivity_u8": base64.b64encode(packed).decode()}
+        return {"phase": phase, "done": done, "total": total,
+                "conductivity": np.round(conductivity, 3).tolist()}
+    return {"phase": phase, "done": done, "total": total,
+            "epsilon": round(float(solver.epsilon), 4),
+            "path": solver.reconstruct_path()}
+
 
-    if current_maze.grid[end_pos[0], end_pos[1]] == 1:
-        print("Warning: End point is inside a building.")
+def model_artifacts(maze):
+    """The shared model when it was trained on this exact layout (or None)"""
+    if shared_model is None or SolutionCache.map_key(maze) != shared_model['key']:
+        return None
+    return shared_model
+
+
+def model_route(model, maze):
+    """Greedy route from the model's Q-table, if it reaches maze.end"""
+    if model['q_table'] is None or model['maze'].end != maze.end:
+        return None
+    reader = QLearningSolver(maze)
+    reader.q_table = model['q_table']
+    path = reader.reconstruct_path()
+    return path if path[-1] == maze.end else None
+
+
+@metrics.timed('request')
+def run_solve(job, maze, settings, events=None):
+    """Worker-thread body: solve (or hit the cache) and build the result.
+
+    The result keeps numpy arrays; send_result serializes it.
+    When an events queue is given, progress snapshots are pushed onto it
+    for /generate/stream.
+    """
+    strategy = settings["strategy"]
+    slime_every = 10  # Conductivity snapshots are large; send every 10th iteration
+
+    def on_progress(phase, solver, done, total):
+        job.update(phase=phase, done=done, total=total)
+        if events is not None and (phase != 'slime' or done % slime_every == 0 or done == total):
+            events.put(("progress", progress_event(phase, solver, done, total, settings.get("binary"))))
+        return not job.cancelled
+
+    # The episode budget is left out of the key: any finished solve of the
+    # same layout, start and end is reused
+    cache_params = {"strategy": strategy, "warm_start": settings["warm_start"],
+                    "batch_size": settings["batch_size"]}
+    cached = solution_cache.get(maze, cache_params)
+    model = model_artifacts(maze) if strategy == 'hybrid' else None
+    model_path = model_route(model, maze) if model is not None else None
+    policy_path, policy = (None, None)
+    if cached is None and strategy not in HybridMazeSolver.ROUTING_STRATEGIES:
+        policy_path, policy = policy_cache.route(maze, cache_params)
+
+    if cached is not None:
+        print("⚡ Cache hit: reusing stored route...")
+        path, conductivity = cached["path"], cached["conductivity"]
+        job.update(phase="cache", done=1, total=1)
+        metrics.inc('maze_solves_total', source='cache')
+    elif model_path is not None:
+        print("⚡ Shared model: reading route from the trained Q-table...")
+        path, conductivity = model_path, model["conductivity"]
+        job.update(phase="model", done=1, total=1)
+        metrics.inc('maze_solves_total', source='model')
+    elif policy is not None:
+        if policy_path is not None:
+            print("⚡ Policy hit: walking the destination's policy from the new start...")
+            metrics.inc('maze_solves_total', source='policy')
+        else:
+            # The destination's Q-values only settled along the trained route
+            print("⚡ Policy hit off the trained route: exact route from the new start...")
+            policy_path = ShortestPathSolver(maze).solve()
+            metrics.inc('maze_solves_total', source='policy_exact')
+        path, conductivity = policy_path, policy["conductivity"]
+        job.update(phase="policy", done=1, total=1)
     else:
-        current_maze.end = tuple(end_pos)
+        # Same layout solved before: reuse its conductivity, and its Q-table
+        # when the destination has not moved. The shared model is the
+        # fallback source for both.
+        warm = None
+        if strategy not in HybridMazeSolver.ROUTING_STRATEGIES:
+            warm = solution_cache.warm_start(maze, cache_params)
+        if warm is None and model is not None and model["conductivity"] is not None:
+            warm = {"conductivity": model["conductivity"], "q_table": model["q_table"],
+                    "end": model["maze"].end}
+        initial_conductivity = warm["conductivity"] if warm else None
+        initial_q_table = warm["q_table"] if warm and warm["end"] == maze.end else None
+
+        # Solve with variable effort
+        solver = HybridMazeSolver(maze, seed=settings.get("seed"))
+        path = solver.solve(training_episodes=settings["episodes"], batch_size=settings["batch_size"],
+                            strategy=strategy, warm_start=settings["warm_start"],
+                            initial_conductivity=initial_conductivity,
+                            initial_q_table=initial_q_table,
+                            progress_callback=on_progress,
+                            early_stopping=True)
+        if job.cancelled:
+            metrics.inc('maze_solves_total', source='cancelled')
+            return None
+        metrics.inc('maze_solves_total', source=strategy)
+        conductivity = solver.conductivity
+        q_table = solver.rl_solver.q_table if strategy not in solver.ROUTING_STRATEGIES else None
+        solution_cache.put(maze, cache_params, conductivity, q_table, path)
+        if strategy not in solver.ROUTING_STRATEGIES and path:
+            # Routing strategies answer a new start faster than a field is built
+            policy_cache.put(maze, cache_params, solver.policy_field(), conductivity)
+        with session_lock:
+            session_solvers[job.owner] = {"solver": solver, "session_map": settings["session_map"],
+                                          "params": cache_params, "lock": threading.Lock()}
+
+    return solve_result(maze, conductivity, path)
 
-    # Solve with variable effort
-    solver = HybridMazeSolver(current_maze)
-    path = solver.solve(training_episodes=ai_episodes)
 
+def solve_result(maze, conductivity, path):
+    """Result dict shared by every solve path; send_result serializes it"""
     status = "success" if path else "error"
+    # The result may outlive this solve: later /traffic updates on the same
+    # arrays copy them on write instead of changing finished jobs
+    for layer in (maze.traffic_jams, conductivity):
+        if layer is not None:
+            layer.flags.writeable = False
 
-    response = {
+    return {
         "status": status,
-        "dimensions": {"width": current_maze.width, "height": current_maze.height},
-        "grid": current_maze.grid.astype(int).tolist(),
-        "traffic": current_maze.traffic_jams.tolist(),
-        "conductivity": solver.conductivity.tolist(),
+        "dimensions": {"width": maze.width, "height": maze.height},
+        "grid": maze.grid,
+        "traffic": maze.traffic_jams,
+        "conductivity": maze.to_grid(conductivity),
         "path": path,
-        "start": current_maze.start,
-        "end": current_maze.end
+        "start": maze.start,
+        "end": maze.end
+    }
+
+
+def client_etags():
+    """Layer ETags the client says it holds (If-None-Match)"""
+    # Werkzeug parses an empty tag ("") as None
+    return {tag for tag in request.if_none_match if tag}
+
+
+def send_result(result):
+    """Content negotiation: compact binary when the client asks for it, JSON otherwise.
+
+    Either way, layers whose ETag the client sends in If-None-Match are left
+    out (see wire_format.json_payload); binary responses name their layers'
+    ETags in X-Layer-ETags.
+    """
+    held = client_etags()
+    best = request.accept_mimetypes.best_match(
+        ['application/json', wire_format.MIME_TYPE, wire_format.MIME_TYPE_ZLIB],
+        default='application/json')
+    if best == 'application/json':
+        response = jsonify(wire_format.json_payload(result, held, sent_layers))
+    else:
+        etags = wire_format.layer_etags(result)
+        omit = [name for name, etag in etags.items() if etag in held]
+        body = wire_format.encode_result(result, compress=best == wire_format.MIME_TYPE_ZLIB, omit=omit)
+        response = Response(body, mimetype=best,
+                            headers={'X-Layer-ETags': ', '.join(f'"{e}"' for e in etags.values())})
+        response.vary.add('Accept')
+    response.vary.add('If-None-Match')
+    return response
+
+
+def accepted_encoding():
+    """'br' or 'gzip' if the client takes it (br only with the brotli module), else None"""
+    return request.accept_encodings.best_match(['br', 'gzip'] if brotli else ['gzip'])
+
+
+def compress_body(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+def compress_stream(chunks, encoding):
+    """Compresses a text stream, flushing after every chunk so events are not held back"""
+    try:
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=5)
+            for chunk in chunks:
+                yield compressor.process(chunk.encode()) + compressor.flush()
+            yield compressor.finish()
+        else:
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip framing
+            for chunk in chunks:
+                yield compressor.compress(chunk.encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            yield compressor.flush()
+    finally:
+        chunks.close()
+
+
+@app.after_request
+def compress_response(response):
+    """gzip/brotli for sizeable JSON, text and uncompressed binary bodies"""
+    if (response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers
+            or not 200 <= response.status_code < 300 or response.mimetype not in COMPRESSIBLE):
+        return response
+    encoding = accepted_encoding()
+    body = response.get_data()
+    if encoding is None or len(body) < COMPRESS_MIN_BYTES:
+        return response
+    response.set_data(compress_body(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def submit_solve(events=None):
+    sid = current_session_id()
+    maze, settings = prepare_solve(sid, request.json or {})
+    job = job_manager.submit(run_solve, maze, settings, events, owner=sid)
+    return job, maze
+
+
+@app.route('/generate', methods=['POST'])
+def generate_simulation():
+    try:
+        job, _ = submit_solve()
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    # Blocking variant of the job API: wait for the pool to finish this solve
+    result = job.future.result()
+    if job.status == "error":
+        return jsonify({"status": "error", "message": job.error}), 500
+    return send_result(result)
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.route('/generate/stream', methods=['POST'])
+def generate_stream():
+    """Same request as /generate, answered as Server-Sent Events.
+
+    Emits 'map' (layout), 'progress' (slime conductivity snapshots, then
+    episode count, epsilon and greedy path) and finally 'result' or 'error'.
+    With "format": "binary" in the body, layers travel as base64 wire_format
+    payloads instead of nested JSON lists. Layers the client holds
+    (If-None-Match) are left out of both 'map' and 'result', and the stream
+    is gzip/brotli-compressed when the client accepts it. Closing the
+    connection cancels the solve.
+    """
+    events = queue.Queue()
+    try:
+        job, maze = submit_solve(events)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    job.future.add_done_callback(lambda _: events.put(("finished", None)))
+    binary = (request.json or {}).get('format') == 'binary'
+    held = client_etags()
+
+    def encoded(result):
+        if not binary:
+            return wire_format.json_payload(result, held, sent_layers)
+        etags = wire_format.layer_etags(result)
+        omit = [name for name, etag in etags.items() if etag in held]
+        payload = wire_format.encode_result(result, compress=True, quantize=True, omit=omit)
+        return {"status": result["status"], "job_id": job.id, "etags": etags, "unchanged": omit,
+                "payload": base64.b64encode(payload).decode()}
+
+    layout = encoded({"status": "success", "grid": maze.grid, "traffic": maze.traffic_jams,
+                      "conductivity": None, "path": [],
+                      "dimensions": {"width": maze.width, "height": maze.height},
+                      "start": maze.start, "end": maze.end})
+    layout["job_id"] = job.id
+    # The client holds the layout from here on; 'result' need not repeat it
+    held = held | set(layout["etags"].values())
+
+    def stream():
+        try:
+            yield sse("map", layout)
+            while True:
+                try:
+                    kind, data = events.get(timeout=1.0)
+                except queue.Empty:
+                    # Heartbeat: a failed write is how a disconnect surfaces
+                    yield ": keep-alive\n\n"
+                    continue
+                if kind == "progress":
+                    yield sse("progress", data)
+                    continue
+                if job.status == "done":
+                    yield sse("result", encoded(job.result))
+                else:
+                    yield sse("error", {"status": "error", "message": job.error or job.status})
+                return
+        finally:
+            # Client gone (or stream finished): stop burning CPU on this solve
+            job.cancel()
+
+    body = stream_with_context(stream())
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    encoding = accepted_encoding()
+    if encoding:
+        body = compress_stream(body, encoding)
+        headers.update({'Content-Encoding': encoding, 'Vary': 'Accept-Encoding, If-None-Match'})
+    return Response(body, mimetype='text/event-stream', headers=headers)
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus scrape target: solver phase timings, counters and cache sizes"""
+    if not metrics.enabled:
+        return jsonify({"status": "error", "message": "Metrics are disabled"}), 404
+    gauges = {
+        "maze_sessions": ("Maps held for browser sessions", len(session_mazes)),
+        "maze_jobs_active": ("Queued or running solve jobs", job_manager.active_count()),
+        "maze_solution_cache_bytes": ("Bytes held by the solution cache", solution_cache.used_bytes),
+        "maze_policy_cache_bytes": ("Bytes held by the policy cache", policy_cache.used_bytes),
     }
+    return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
+
+def traffic_cells(change):
+    """Cells of one /traffic change: explicit "cells", or a straight "from"/"to" segment"""
+    if "cells" in change:
+        return [tuple(c) for c in change["cells"]]
+    (x0, y0), (x1, y1) = change["from"], change["to"]
+    if x0 != x1 and y0 != y1:
+        raise ValueError("A traffic segment must run along one row or column")
+    steps = max(abs(x1 - x0), abs(y1 - y0))
+    dx, dy = np.sign(x1 - x0), np.sign(y1 - y0)
+    return [(x0 + dx * i, y0 + dy * i) for i in range(steps + 1)]
+
+
+@app.route('/traffic', methods=['POST'])
+def update_traffic():
+    """Applies live traffic changes to the session's map.
+
+    Body: {"changes": [{"cells": [[x, y], ...], "severity": 5.0},
+                       {"from": [x, y], "to": [x, y], "severity": 0}]}
+    (severity 0 clears a jam). When the session's last solve was on this
+    map, it is refreshed around the changed cells only
+    (HybridMazeSolver.update_traffic) and the new route is returned like
+    /generate; otherwise the map is updated and {"status": "updated"} tells
+    the client to solve again.
+    """
+    data = request.json or {}
+    sid = current_session_id()
+    try:
+        changes = [(traffic_cells(c), float(c.get("severity", 0))) for c in data.get("changes", [])]
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"status": "error", "message": f"Bad traffic change: {e}"}), 400
+
+    with session_lock:
+        entry = session_solvers.get(sid)
+
+    # The solver's lock keeps this session's updates in order
+    with entry["lock"] if entry else contextlib.nullcontext():
+        with session_lock:
+            maze = session_mazes.get(sid)
+            if maze is None:
+                return jsonify({"status": "error", "message": "No map for this session"}), 404
+            solver = entry["solver"] if entry else None
+            if solver is not None and not (entry["session_map"] is maze
+                                           and solver.maze.version == maze.version
+                                           and solver.maze.start == maze.start
+                                           and solver.maze.end == maze.end):
+                solver = None  # The map moved on since that solve
+            for cells, severity in changes:
+                maze.set_traffic(cells, severity)
+            if solver is not None:
+                entry["session_map"] = maze
+
+        if solver is None:
+            return jsonify({"status": "updated", "version": maze.version})
+
+        for cells, severity in changes:
+            solver.update_traffic(cells, severity)
+        q_table = solver.rl_solver.q_table if solver.strategy not in solver.ROUTING_STRATEGIES else None
+        solution_cache.put(solver.maze, entry["params"], solver.conductivity, q_table, solver.final_path)
+        result = solve_result(solver.maze, solver.conductivity, solver.final_path)
+    return send_result(result)
+
+
+# --- Job API: submit, poll, fetch ---------------------------------------
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    try:
+        job, _ = submit_solve()
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return jsonify(job.to_dict()), 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = job_manager.get(job_id, owner=current_session_id())
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown job"}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    job = job_manager.get(job_id, owner=current_session_id())
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown job"}), 404
+    if job.status in ("queued", "running"):
+        return jsonify(job.to_dict()), 202
+    if job.status == "error":
+        return jsonify({"status": "error", "message": job.error}), 500
+    if job.status == "cancelled":
+        return jsonify({"status": "error", "message": "Job was cancelled"}), 410
+    return send_result(job.result)
+
 
-    return jsonify(response)
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    job = job_manager.get(job_id, owner=current_session_id())
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown job"}), 404
+    job.cancel()
+    return jsonify(job.to_dict())
 
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    app.run(debug=True, port=5000, threaded=True)
@@ -0,0 +1,133 @@
+# shortest_path.py
+import heapq
+import numpy as np
+
+
+def route_cost(maze, path):
+    """Cost the solvers optimize: 1 per step plus 2 per unit of traffic entered"""
+    return float(sum(1 + 2 * maze.traffic_jams[x, y] for x, y in path[1:]))
+
+
+class ShortestPathSolver:
+    def __init__(self, maze, conductivity_map=None, traffic_weight=2.0, conductivity_weight=1.0):
+        self.maze = maze
+        self.conductivity = conductivity_map
+        self.traffic_weight = traffic_weight  # Same traffic penalty as the Q-learning reward
+        self.conductivity_weight = conductivity_weight
+        self.cost_to_go = None
+
+    def cell_costs(self):
+        """Cost of entering each state (flat); every step costs at least 1"""
+        costs = 1.0 + self.traffic_weight * np.maximum(self.maze.state_values(self.maze.traffic_jams), 0)
+        if self.conductivity is not None:
+            # Low conductivity (unused or jammed roads) costs more
+            costs = costs + self.conductivity_weight * (1.0 - np.clip(self.conductivity, 0, 1))
+        return costs.ravel()
+
+    def solve(self):
+        """A* from start to end with a Manhattan heuristic; [] if unreachable"""
+        w = self.maze.width
+        mask = self.maze.action_mask
+        trans = memoryview(self.maze.transitions.reshape(-1))
+        moves = memoryview(np.packbits(mask, axis=1, bitorder='little').ravel())
+        costs = memoryview(self.cell_costs())
+        cells = memoryview(self.maze.state_cells)
+
+        start = self.maze.state_index(self.maze.start)
+        goal = self.maze.state_index(self.maze.end)
+        gx, gy = self.maze.end
+
+        best = {start: 0.0}
+        parent = {start: -1}
+        # Ties on f are broken toward larger g so equal-cost plateaus are
+        # crossed depth-first instead of flooded
+        heap = [(abs(self.maze.start[0] - gx) + abs(self.maze.start[1] - gy), 0.0, start)]
+        while heap:
+            _, neg_g, cell = heapq.heappop(heap)
+            g = -neg_g
+            if cell == goal:
+                break
+            if g > best[cell]:
+                continue  # Stale heap entry
+            bits = moves[cell]
+            for a in range(4):
+                if not bits & (1 << a):
+                    continue
+                nxt = trans[cell * 4 + a]
+                ng = g + costs[nxt]
+                if ng < best.get(nxt, float('inf')):
+                    best[nxt] = ng
+                    parent[nxt] = cell
+                    x, y = divmod(cells[nxt], w)
+                    heapq.heappush(heap, (ng + abs(x - gx) + abs(y - gy), -ng, nxt))
+
+        if goal not in parent:
+            return []
+
+        path = []
+        cell = goal
+        while cell != -1:
+            path.append(divmod(cells[cell], w))
+            cell = parent[cell]
+        return path[::-1]
+
+    def solve_all(self):
+        """Dijkstra from end over every road cell.
+
+        Returns (cost_to_go, order, next_action): the exact cost from each
+        state to end (inf if unreachable, shaped like the maze's states),
+        states in settling order, and the action each state takes along its
+        shortest route (-1 at end).
+        """
+        size = self.maze.num_states
+        mask = self.maze.action_mask
+        trans = memoryview(self.maze.transitions.reshape(-1))
+        moves = memoryview(np.packbits(mask, axis=1, bitorder='little').ravel())
+        costs = memoryview(self.cell_costs())
+
+        goal = self.maze.state_index(self.maze.end)
+        dist = [float('inf')] * size
+        next_action = [-1] * size
+        dist[goal] = 0.0
+        order = []
+        heap = [(0.0, goal)]
+        while heap:
+            d, cell = heapq.heappop(heap)
+            if d > dist[cell]:
+                continue
+            order.append(cell)
+            # Roads are two-way: every neighbour can step into this cell
+            enter = costs[cell]
+            bits = moves[cell]
+            for a in range(4):
+                if not bits & (1 << a):
+                    continue
+                prev = trans[cell * 4 + a]
+                nd = d + enter
+                if nd < dist[prev]:
+                    dist[prev] = nd
+                    next_action[prev] = a ^ 1  # Opposite move leads back here
+                    heapq.heappush(heap, (nd, prev))
+
+        self.cost_to_go = np.array(dist).reshape(self.maze.state_shape)
+        return self.cost_to_go, np.array(order, dtype=np.int64), np.array(next_action, dtype=np.int64)
+
+    def seed_q_table(self, q_solver):
+        """Warm-starts a QLearningSolver with the return of the shortest-path policy.
+
+        Values are the discounted Q-learning rewards collected while following
+        the exact route to end, so they sit on the same scale training uses.
+        """
+        next_state, valid, rewards = q_solver.build_tables()
+        _, order, next_action = self.solve_all()
+
+        # Settling order guarantees each cell's successor is already valued
+        values = np.zeros(len(next_action))
+        for cell in order[1:].tolist():
+            a = next_action[cell]
+            values[cell] = rewards[cell, a] + q_solver.gamma * values[next_state[cell, a]]
+
+        q = rewards + q_solver.gamma * values[next_state]
+        q[~valid] = q_solver.wall_penalty
+        q_solver.q_table[:] = q.reshape(q_solver.q_table.shape)
+        return q_solver.q_table
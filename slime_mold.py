@@ -1,23 +1,32 @@
 # slime_mold.py
 import numpy as np
+import metrics
 
 class SlimeMoldSolver:
-    def __init__(self, maze, num_agents=50, max_iters=100):
+    def __init__(self, maze, num_agents=50, max_iters=100, progress_callback=None, seed=None):
         self.maze = maze
         self.num_agents = num_agents
         self.max_iters = max_iters
+        # progress_callback(phase, solver, done, total) after every iteration;
+        # returning False stops early
+        self.progress_callback = progress_callback
+        self.stopped = False
+        # seed: int, SeedSequence or np.random.Generator
+        self.rng = np.random.default_rng(seed)
         self.z = 0.05  # Reduced random exploration to stay focused
 
-        # Initialize conductivity
-        self.conductivity = np.ones((maze.height, maze.width))
+        # Initialize conductivity (per state: road cells only on a compact map)
+        self.conductivity = np.ones(maze.state_shape, dtype=maze.dtype)
         # Zero conductivity on buildings
-        self.conductivity[maze.grid == 1] = 0
+        self.conductivity[maze.state_values(maze.grid) == 1] = 0
 
         # PENALIZE TRAFFIC in the base conductivity
         # If traffic is 5.0, conductivity becomes very low (e.g., 0.1)
         # Formula: 1.0 / (1.0 + traffic_intensity)
-        traffic_factor = 1.0 / (1.0 + maze.traffic_jams)
+        traffic_factor = 1.0 / (1.0 + maze.state_values(maze.traffic_jams))
         self.conductivity *= traffic_factor
+        # Conductivity is (base + deposits) / scale; solve() sets the scale
+        self.scale = 1.0
 
     def objective_function(self, position):
         x, y = position
@@ -35,44 +44,85 @@ class SlimeMoldSolver:
 
         return dist + traffic_cost
 
+    def update_traffic(self, cells, before):
+        """Updates conductivity in place at road cells whose traffic changed from before.
+
+        Only the base term 1 / (1 + traffic) set in __init__ depends on
+        traffic; the agents' deposits stay, so the change at each cell is
+        the difference of the two base terms over scale.
+        """
+        xs, ys = np.divmod(np.asarray(cells), self.maze.width)
+        states = self.maze.state_indices(xs, ys)
+        after = self.maze.traffic_jams[xs, ys]
+        change = 1.0 / (1.0 + after) - 1.0 / (1.0 + np.asarray(before))
+        self.conductivity.reshape(-1)[states] += change / self.scale
+        return states
+
+    def adopt(self, conductivity):
+        """Takes over conductivity from an earlier solve of this map (e.g. a cached one).
+
+        Its scale is recovered from traffic-free roads: their base term is 1,
+        so the lowest of them, a road no agent visited, holds 1 / scale.
+        """
+        self.conductivity = conductivity
+        maze = self.maze
+        free = (maze.state_values(maze.grid) == 0) & (maze.state_values(maze.traffic_jams) == 0)
+        low = float(conductivity[free].min()) if free.any() else 0.0
+        self.scale = 1.0 / low if low > 0 else 1.0
+
     def initialize_positions(self):
-        positions = []
-        for _ in range(self.num_agents):
-            while True:
-                x = np.random.randint(0, self.maze.height)
-                y = np.random.randint(0, self.maze.width)
-                if self.maze.is_valid(x, y):
-                    positions.append((x, y))
-                    break
-        return np.array(positions)
+        # Sample road cells directly from the maze's walkability index
+        roads = np.flatnonzero(self.maze.walkable)
+        picks = roads[self.rng.integers(0, len(roads), size=self.num_agents)]
+        return np.stack(np.divmod(picks, self.maze.width), axis=1)
+
+    def batch_objective(self, positions):
+        """objective_function for an (N, 2) array of integer positions"""
+        goal = np.array(self.maze.end)
+        dist = np.sqrt(((positions - goal) ** 2).sum(axis=1))
+        return dist + self.maze.traffic_jams[positions[:, 0], positions[:, 1]] * 10
 
+    @metrics.timed('slime')
     def solve(self):
         positions = self.initialize_positions()
+        walkable = self.maze.walkable
+        deposits = self.conductivity.reshape(-1)
+        upper = np.array([self.maze.height - 1, self.maze.width - 1])
+        n = self.num_agents
         w = 0.9  # Weight parameter
+        moves = blocked = 0
 
         for iteration in range(self.max_iters):
-            fitness = np.array([self.objective_function(pos) for pos in positions])
-            sorted_idx = np.argsort(fitness)
-            positions = positions[sorted_idx]
+            fitness = self.batch_objective(positions)
+            positions = positions[np.argsort(fitness)]
             best_pos = positions[0]
 
             w = w * np.exp(-iteration / self.max_iters)
 
-            for j in range(self.num_agents):
-                if np.random.random() < w:
-                    direction = best_pos - positions[j]
-                    new_pos = positions[j] + np.random.rand() * direction
-                else:
-                    rand_idx = np.random.randint(0, self.num_agents)
-                    direction = positions[rand_idx] - positions[j]
-                    new_pos = positions[j] + self.z * np.random.rand() * direction
+            # Every agent either approaches the best one or drifts toward a random peer
+            approach = self.rng.random(n) < w
+            step = self.rng.random(n)[:, None]
+            peers = positions[self.rng.integers(0, n, size=n)]
+            new_pos = np.where(approach[:, None],
+                               positions + step * (best_pos - positions),
+                               positions + self.z * step * (peers - positions))
 
-                new_pos = np.clip(new_pos, [0, 0], [self.maze.height - 1, self.maze.width - 1])
-                new_pos = new_pos.astype(int)
+            new_pos = np.clip(new_pos, 0, upper).astype(int)
 
-                if self.maze.is_valid(new_pos[0], new_pos[1]):
-                    self.conductivity[new_pos[0], new_pos[1]] += 0.1
-                    positions[j] = new_pos
+            # Already clipped into bounds, so only walkability matters
+            moved = walkable[new_pos[:, 0], new_pos[:, 1]]
+            np.add.at(deposits, self.maze.state_indices(new_pos[moved, 0], new_pos[moved, 1]), 0.1)
+            positions[moved] = new_pos[moved]
+            moves += n
+            blocked += n - int(np.count_nonzero(moved))
+
+            if self.progress_callback is not None:
+                if self.progress_callback('slime', self, iteration + 1, self.max_iters) is False:
+                    self.stopped = True
+                    break
 
-        self.conductivity = self.conductivity / np.max(self.conductivity)
+        metrics.inc('maze_steps_total', moves, solver='slime')
+        metrics.inc('maze_wall_collisions_total', blocked, solver='slime')
+        self.scale = float(np.max(self.conductivity))
+        self.conductivity = self.conductivity / self.scale
         return self.conductivity
\ No newline at end of file
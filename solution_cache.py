@@ -0,0 +1,105 @@
+# solution_cache.py
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+import numpy as np
+import metrics
+
+
+class SolutionCache:
+    """LRU cache of solve results under a memory budget.
+
+    Entries are keyed by a fingerprint of the map layout (grid, traffic_jams),
+    start, end and solver parameters. The newest entry of each layout is also
+    tracked so a solve with only a new start/end can warm start from its
+    conductivity and Q-table. Safe to share between request threads.
+    """
+
+    def __init__(self, max_bytes=64 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.latest_by_map = {}
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def map_key(maze, params=None):
+        """Fingerprint of the layout and solver parameters (not start/end)"""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(np.array(maze.grid.shape, dtype=np.int64).tobytes())
+        h.update(np.ascontiguousarray(maze.grid, dtype=np.uint8).tobytes())
+        h.update(np.ascontiguousarray(maze.traffic_jams, dtype=np.float64).tobytes())
+        h.update(json.dumps(params or {}, sort_keys=True).encode())
+        return h.hexdigest()
+
+    def key(self, maze, params=None):
+        map_key = self.map_key(maze, params)
+        return f"{map_key}:{maze.start[0]},{maze.start[1]}:{maze.end[0]},{maze.end[1]}", map_key
+
+    def get(self, maze, params=None):
+        """Cached entry for this exact map, start, end and parameters (or None)"""
+        key, _ = self.key(maze, params)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                metrics.inc('maze_cache_requests_total', cache='solution', result='miss')
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            metrics.inc('maze_cache_requests_total', cache='solution', result='hit')
+            return entry
+
+    def warm_start(self, maze, params=None):
+        """Newest entry on the same layout, whatever its start/end (or None).
+
+        Its Q-table encodes rewards toward the entry's own end, so callers
+        should only reuse it when that end matches.
+        """
+        map_key = self.map_key(maze, params)
+        with self._lock:
+            key = self.latest_by_map.get(map_key)
+            return self.entries.get(key) if key else None
+
+    def put(self, maze, params, conductivity, q_table, path):
+        key, map_key = self.key(maze, params)
+        entry = {
+            "conductivity": None if conductivity is None else np.array(conductivity),
+            "q_table": None if q_table is None else np.array(q_table),
+            "path": [tuple(p) for p in path] if path else path,
+            "start": tuple(maze.start),
+            "end": tuple(maze.end),
+        }
+        entry["nbytes"] = sum(v.nbytes for v in (entry["conductivity"], entry["q_table"])
+                              if v is not None) + 16 * len(path or ())
+
+        with self._lock:
+            if key in self.entries:
+                self._remove(key)
+            if entry["nbytes"] > self.max_bytes:
+                return None  # Larger than the whole budget: never cache
+
+            self.entries[key] = entry
+            self.latest_by_map[map_key] = key
+            self.used_bytes += entry["nbytes"]
+
+            # Evict least recently used entries until back under budget
+            while self.used_bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+            return entry
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.used_bytes -= entry["nbytes"]
+        map_key = key.split(":", 1)[0]
+        if self.latest_by_map.get(map_key) == key:
+            del self.latest_by_map[map_key]
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.latest_by_map.clear()
+            self.used_bytes = 0
@@ -0,0 +1,64 @@
+# test_ant_colony.py
+import numpy as np
+import pytest
+from ant_colony import AntColonySolver
+from city_generator import CityMap
+
+
+def city(size=21, seed=3, compact=False):
+    maze = CityMap(width=size, height=size, compact=compact, seed=seed)
+    maze.generate_manhattan_grid()
+    return maze
+
+
+def run(maze, **kwargs):
+    solver = AntColonySolver(maze, num_ants=8, num_iterations=5, **kwargs)
+    return solver.solve(), solver.pheromones
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_same_seed_same_colony(workers):
+    maze = city()
+    path, pheromones = run(maze, seed=5, workers=workers)
+    again, pheromones_again = run(maze, seed=5, workers=workers)
+    assert path == again
+    np.testing.assert_array_equal(pheromones, pheromones_again)
+
+
+def test_seeded_route_is_a_walk_from_start_to_end():
+    maze = city()
+    path, _ = run(maze, seed=5)
+    assert path is not None
+    assert path[0] == maze.start and path[-1] == maze.end
+    assert all(b in maze.get_neighbors(a) for a, b in zip(path, path[1:]))
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_scalar_heuristic_matches_the_field(compact):
+    maze = city(compact=compact)
+    solver = AntColonySolver(maze, seed=0)
+    field = solver.heuristic_field()
+    for cell in [(1, 1), (5, 9), maze.end]:
+        assert solver.heuristic(None, cell) == pytest.approx(field.reshape(-1)[maze.state_index(cell)])
+
+
+def test_select_next_picks_an_unvisited_neighbour():
+    maze = city()
+    solver = AntColonySolver(maze, seed=0)
+    neighbors = maze.get_neighbors(maze.start)
+    for _ in range(20):
+        assert solver.select_next(maze.start, {maze.start}) in neighbors
+    assert solver.select_next(maze.start, set(neighbors)) is None  # Dead end
+
+
+def test_ant_paths_are_simple_and_buffers_reset():
+    maze = city()
+    solver = AntColonySolver(maze, seed=0)
+    # Without pheromone trails most ants dead-end; a few of 300 get through
+    paths = [solver.construct_solution() for _ in range(300)]
+    reached = [p for p in paths if p is not None]
+    assert reached
+    for path in reached:
+        assert path.dtype == np.int32 and len(set(path.tolist())) == len(path)
+        assert path[0] == maze.state_index(maze.start) and path[-1] == maze.state_index(maze.end)
+    assert not any(solver._seen)  # Every ant clears its own visits
@@ -0,0 +1,47 @@
+# test_benchmark.py
+import os
+import subprocess
+import sys
+import benchmark
+import metrics
+
+PHASES = ["generate", "slime", "astar", "hierarchical", "qlearning", "reconstruct", "planning",
+          "aco", "export", "json"]
+
+
+def test_run_records_every_phase_with_metrics_off():
+    was = metrics.enabled
+    metrics.enable(True)
+    try:
+        report = benchmark.run([21], [1.0], episodes=200, memory=False, repeat=1)
+        assert not metrics.enabled  # Timings are of the uninstrumented solvers
+    finally:
+        metrics.enable(was)
+    records = report["results"]
+    assert [r["phase"] for r in records] == PHASES
+    assert all(r["size"] == 21 and r["seconds"] >= 0 for r in records)
+    by_phase = {r["phase"]: r for r in records}
+    assert by_phase["astar"]["cost"] > 0
+    assert by_phase["json"]["bytes"] > 0 and by_phase["export"]["bytes"] > 0
+
+
+def test_benchmark_does_not_import_the_server():
+    # The server turns metrics on at import, which would skew the timings
+    code = "import benchmark, sys; assert 'server' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_compare_flags_slowdowns_and_lost_routes():
+    def report(**changes):
+        record = {"size": 41, "density": 1.0, "phase": "qlearning", "seconds": 1.0, "peak_mb": 10.0,
+                  "reached": True, "quality": 1.05}
+        record.update(changes)
+        return {"results": [record]}
+
+    baseline = report()
+    assert benchmark.compare(baseline, report(seconds=1.2)) == []
+    assert benchmark.compare(report(seconds=0.001), report(seconds=0.004)) == []  # Noise
+    assert len(benchmark.compare(baseline, report(seconds=2.0))) == 1
+    assert len(benchmark.compare(baseline, report(peak_mb=20.0))) == 1
+    assert "no longer reaches" in benchmark.compare(baseline, report(reached=False, quality=None))[0]
+    assert "quality" in benchmark.compare(baseline, report(quality=1.2))[0]
@@ -0,0 +1,183 @@
+# test_city_generator.py
+import copy
+import numpy as np
+from city_generator import CityMap
+
+
+def city(size=21, seed=3, compact=False):
+    maze = CityMap(width=size, height=size, compact=compact, seed=seed)
+    maze.generate_manhattan_grid()
+    return maze
+
+
+def rebuilt(maze):
+    """The index tables of maze as a full rebuild computes them"""
+    fresh = CityMap(width=maze.width, height=maze.height, compact=maze.compact,
+                    layers=(maze.grid.copy(), maze.traffic_jams.copy()))
+    fresh.end = maze.end
+    return fresh
+
+
+def assert_same_index(maze, fresh):
+    for name in ('walkable', 'action_mask', 'transitions', 'traffic_cost', 'goal_progress'):
+        np.testing.assert_array_equal(getattr(maze, name), getattr(fresh, name), err_msg=name)
+    assert [maze.valid_actions((x, y)) for x in range(maze.height) for y in range(maze.width)] == \
+           [fresh.valid_actions((x, y)) for x in range(fresh.height) for y in range(fresh.width)]
+
+
+def test_set_traffic_refreshes_only_the_changed_rows():
+    maze = city()
+    transitions = maze.transitions
+    changed, before = maze.set_traffic([(1, 3), (1, 4), (0, 0)], 5.0)
+    # Buildings are ignored; the index is patched, not rebuilt
+    assert len(changed) == 2 and 0 not in changed
+    assert (before == 0).all()
+    assert maze.transitions is transitions
+    assert_same_index(maze, rebuilt(maze))
+
+
+def test_in_place_edit_with_invalidate_cells():
+    maze = city()
+    maze.transitions
+    maze.grid[1, 2] = 1
+    maze.invalidate([(1, 2)])
+    assert not maze.is_valid(1, 2)
+    assert_same_index(maze, rebuilt(maze))
+
+
+def test_moving_end_rebuilds_goal_progress_only():
+    maze = city()
+    transitions = maze.transitions
+    maze.end = (1, maze.width - 2)
+    assert maze.transitions is transitions
+    assert_same_index(maze, rebuilt(maze))
+
+
+def test_deepcopy_has_its_own_byte_views():
+    maze = city()
+    maze.transitions
+    clone = copy.deepcopy(maze)
+    clone.set_traffic([(1, 3)], 5.0)
+    clone.grid[1, 2] = 1
+    clone.invalidate([(1, 2)])
+    # The original's scalar lookups (bytearrays and their views) are untouched
+    assert maze.is_valid(1, 2) and not clone.is_valid(1, 2)
+    assert_same_index(maze, rebuilt(maze))
+    assert_same_index(clone, rebuilt(clone))
+
+
+def compact_twin(maze):
+    """Compact map over the same layout as a dense one"""
+    twin = CityMap(width=maze.width, height=maze.height, compact=True,
+                   layers=(maze.grid.astype(np.uint8), maze.traffic_jams.astype(np.float32)))
+    twin.start, twin.end = maze.start, maze.end
+    return twin
+
+
+def test_compact_state_ids_cover_roads_only():
+    dense = city()
+    maze = compact_twin(dense)
+    roads = np.flatnonzero(dense.grid == 0)
+    assert maze.num_states == len(roads) and maze.state_shape == (len(roads),)
+    np.testing.assert_array_equal(maze.state_cells, roads)
+    for state in (0, 7, maze.num_states - 1):
+        assert maze.state_index(maze.state_pos(state)) == state
+    assert maze.state_index((0, 0)) == -1
+    xs, ys = np.divmod(roads, maze.width)
+    np.testing.assert_array_equal(maze.state_indices(xs, ys), np.arange(len(roads)))
+
+
+def test_compact_tables_match_the_dense_ones():
+    dense = city()
+    maze = compact_twin(dense)
+    cells = maze.state_cells
+    np.testing.assert_array_equal(maze.action_mask, dense.action_mask.reshape(-1, 4)[cells])
+    np.testing.assert_array_equal(maze.cells_of(maze.transitions),
+                                  dense.transitions.reshape(-1, 4)[cells])
+    np.testing.assert_allclose(maze.traffic_cost, dense.traffic_cost.reshape(-1, 4)[cells])
+    np.testing.assert_array_equal(maze.goal_progress, dense.goal_progress.reshape(-1, 4)[cells])
+    values = maze.state_values(dense.traffic_jams)
+    np.testing.assert_array_equal(maze.to_grid(values), np.where(dense.grid == 0, dense.traffic_jams, 0))
+    np.testing.assert_array_equal(maze.reachable(), dense.reachable())
+
+
+def test_compact_map_renumbers_roads_when_one_opens():
+    maze = compact_twin(city())
+    roads = maze.num_states
+    maze.set_traffic([(1, 3)], 5.0)  # Traffic only: ids stay, rows are patched
+    assert maze.num_states == roads
+    x, y = np.argwhere(maze.grid[1:-1, 1:-1] == 1)[0] + 1  # An interior building
+    assert maze.state_index((x, y)) == -1
+    maze.grid[x, y] = 0
+    maze.invalidate([(x, y)])
+    assert maze.num_states == roads + 1
+    assert maze.state_index((x, y)) >= 0
+    assert_same_index(maze, rebuilt(maze))
+
+
+def test_snapshot_copies_writeable_layers_and_shares_the_index():
+    maze = city()
+    transitions = maze.transitions
+    clone = maze.snapshot()
+    assert clone.grid is not maze.grid and clone.traffic_jams is not maze.traffic_jams
+    assert clone.transitions is transitions  # Shared until either side edits it
+    clone.start = (1, 3)
+    assert maze.start == (1, 1)
+
+
+def test_snapshot_edits_copy_on_write():
+    maze = city()
+    maze.transitions
+    maze.grid.flags.writeable = maze.traffic_jams.flags.writeable = False  # e.g. memory-mapped
+    clone = maze.snapshot()
+    assert clone.grid is maze.grid and clone.traffic_jams is maze.traffic_jams
+    clone.set_traffic([(1, 3)], 5.0)
+    assert clone.traffic_jams is not maze.traffic_jams
+    assert maze.traffic_jams[1, 3] == 0 and clone.traffic_jams[1, 3] == 5.0
+    assert clone.transitions is not maze.transitions
+    assert_same_index(maze, rebuilt(maze))
+    assert_same_index(clone, rebuilt(clone))
+
+
+def test_same_seed_same_city():
+    a, b, c = city(seed=11), city(seed=11), city(seed=12)
+    np.testing.assert_array_equal(a.grid, b.grid)
+    np.testing.assert_array_equal(a.traffic_jams, b.traffic_jams)
+    assert not np.array_equal(a.grid, c.grid) or not np.array_equal(a.traffic_jams, c.traffic_jams)
+
+
+def edge_roads(size):
+    """Road cells of a border row or column: only where an artery meets it"""
+    index = np.arange(size)
+    return ((index % 4 == 1) & (index < size - 1)) | (index == size - 2)
+
+
+def test_alleys_never_reach_the_border():
+    for seed in range(20):
+        maze = city(size=41, seed=seed)
+        # Masked-out alley cells (-1) used to carve the far corner
+        assert maze.grid[-1, -1] == 1
+        for edge in (maze.grid[0], maze.grid[-1], maze.grid[:, 0], maze.grid[:, -1]):
+            np.testing.assert_array_equal(edge == 0, edge_roads(41))
+
+
+def test_start_and_end_are_roads_and_jams_keep_clear():
+    for seed in range(10):
+        maze = city(size=41, seed=seed)
+        assert maze.is_valid(*maze.start) and maze.is_valid(*maze.end)
+        jams = np.argwhere(maze.traffic_jams > 0)
+        assert (maze.grid[jams[:, 0], jams[:, 1]] == 0).all()
+        for x, y in (maze.start, maze.end):
+            assert (np.abs(jams - (x, y)).sum(axis=1) > CityMap.SAFE_RADIUS).all()
+
+
+def test_tiles_come_out_the_same_in_any_order():
+    tiled = CityMap(width=41, height=41, seed=5)
+    tiled.generate_manhattan_grid(tile_size=16)
+    other = CityMap(width=41, height=41, seed=5)
+    origins = [(x0, y0) for x0 in range(0, 41, 16) for y0 in range(0, 41, 16)]
+    for x0, y0 in reversed(origins):
+        grid, traffic = other.generate_tile(x0, y0, tile_size=16)
+        np.testing.assert_array_equal(grid, tiled.grid[x0:x0 + 16, y0:y0 + 16])
+        np.testing.assert_array_equal(traffic, tiled.traffic_jams[x0:x0 + 16, y0:y0 + 16])
+    np.testing.assert_array_equal(other.grid, np.ones((41, 41)))  # Tiles leave the map alone
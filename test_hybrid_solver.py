@@ -0,0 +1,56 @@
+# test_hybrid_solver.py
+import numpy as np
+import pytest
+from city_generator import CityMap
+from hybrid_solver import HybridMazeSolver
+from q_learning import QLearningSolver
+from shortest_path import ShortestPathSolver, route_cost
+
+
+def city(size=21, seed=3, compact=False):
+    maze = CityMap(width=size, height=size, compact=compact, seed=seed)
+    maze.generate_manhattan_grid()
+    return maze
+
+
+@pytest.mark.parametrize("strategy", ["astar", "hierarchical"])
+def test_routing_strategies_reroute_around_new_traffic(strategy):
+    maze = city()
+    solver = HybridMazeSolver(maze, seed=1)
+    path = solver.solve(strategy=strategy)
+    path = solver.update_traffic(path[3:6], 5.0)
+    assert path[0] == maze.start and path[-1] == maze.end
+    if strategy == 'astar':
+        assert route_cost(maze, path) == pytest.approx(route_cost(maze, ShortestPathSolver(maze).solve()))
+
+
+def test_planned_update_matches_planning_from_scratch():
+    maze = city()
+    solver = HybridMazeSolver(maze, seed=1)
+    path = solver.solve(strategy='planned')
+    path = solver.update_traffic(path[3:6], 5.0)
+    assert solver.rl_solver.conductivity is solver.conductivity
+    replanned = QLearningSolver(maze, conductivity_map=solver.conductivity, planning=True).solve()
+    assert path == replanned
+
+
+def test_update_traffic_copies_a_read_only_result():
+    maze = city()
+    solver = HybridMazeSolver(maze, seed=1)
+    path = solver.solve(strategy='planned')
+    shown = solver.conductivity
+    shown.flags.writeable = False  # As server.solve_result leaves it
+    before = shown.copy()
+    solver.update_traffic(path[3:6], 5.0)
+    assert solver.conductivity is not shown
+    assert solver.rl_solver.conductivity is solver.conductivity
+    np.testing.assert_array_equal(shown, before)
+
+
+def test_no_change_keeps_the_route():
+    maze = city()
+    solver = HybridMazeSolver(maze, seed=1)
+    path = solver.solve(strategy='astar')
+    version = maze.version
+    assert solver.update_traffic([(0, 0)], 5.0) == path  # A building: nothing changes
+    assert maze.version == version
@@ -0,0 +1,39 @@
+# test_main.py
+import argparse
+import json
+import pstats
+import pytest
+import main
+import wire_format
+
+
+def test_parse_pipeline_expands_aliases():
+    assert main.parse_pipeline("hybrid") == ["slime", "qlearning"]
+    assert main.parse_pipeline("slime + ASTAR") == ["slime", "astar"]
+    with pytest.raises(argparse.ArgumentTypeError):
+        main.parse_pipeline("slime+teleport")
+
+
+def test_routing_pipeline_exports_without_conductivity(tmp_path):
+    code = main.main(["--size", "21", "--seed", "3", "--pipeline", "astar", "--format", "json", "mzs",
+                      "--out-dir", str(tmp_path), "--quiet"])
+    assert code == 0
+    with open(tmp_path / "traffic_data.json") as f:
+        data = json.load(f)
+    assert data["conductivity"] is None and data["path"][-1] == [19, 19]
+    decoded = wire_format.decode((tmp_path / "traffic_data.mzs").read_bytes())
+    assert decoded["conductivity"] is None and decoded["path"][-1] == (19, 19)
+
+
+def test_pipeline_with_profile_and_model(tmp_path, capsys):
+    profile = tmp_path / "run.prof"
+    code = main.main(["--size", "21", "--seed", "3", "--pipeline", "slime+planned+hierarchical",
+                      "--slime-iterations", "10", "--format", "model", "--out-dir", str(tmp_path),
+                      "--profile", str(profile), "--quiet"])
+    assert code == 0
+    out = capsys.readouterr().out
+    for phase in ("generate", "slime", "planned", "hierarchical", "export", "total"):
+        assert phase in out
+    assert pstats.Stats(str(profile)).total_calls > 0
+    assert (tmp_path / "city_model" / "conductivity.npy").exists()
+    assert (tmp_path / "city_model" / "q_table.npy").exists()
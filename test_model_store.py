@@ -0,0 +1,52 @@
+# test_model_store.py
+import numpy as np
+from city_generator import CityMap
+from model_store import load_model, save_model
+from q_learning import QLearningSolver
+
+
+def city(size=21, seed=3, compact=False):
+    maze = CityMap(width=size, height=size, compact=compact, seed=seed)
+    maze.generate_manhattan_grid()
+    return maze
+
+
+def test_save_and_load_round_trip(tmp_path):
+    maze = city()
+    maze.end = (1, maze.width - 2)
+    solver = QLearningSolver(maze, episodes=300, batch_size=32, seed=0)
+    path = solver.solve()
+    conductivity = np.linspace(0, 1, maze.num_states).reshape(maze.state_shape)
+    save_model(tmp_path, maze, conductivity, solver.q_table, path)
+
+    model = load_model(tmp_path)
+    loaded = model['maze']
+    assert (loaded.width, loaded.height, loaded.start, loaded.end) == \
+           (maze.width, maze.height, maze.start, maze.end)
+    np.testing.assert_array_equal(loaded.grid, maze.grid)
+    np.testing.assert_array_equal(loaded.traffic_jams, maze.traffic_jams)
+    np.testing.assert_array_equal(model['conductivity'], conductivity)
+    np.testing.assert_array_equal(model['q_table'], solver.q_table)
+    assert model['path'] == path
+    assert isinstance(loaded.grid, np.memmap) and not loaded.grid.flags.writeable
+
+
+def test_missing_artifacts_load_as_none(tmp_path):
+    maze = city(compact=True)
+    save_model(tmp_path, maze, q_table=np.zeros((maze.num_states, 4)))
+    save_model(tmp_path, maze)  # Drops the stale q_table
+    model = load_model(tmp_path)
+    assert model['conductivity'] is None and model['q_table'] is None and model['path'] is None
+    assert model['maze'].compact and model['maze'].num_states == maze.num_states
+
+
+def test_snapshots_of_a_loaded_model_never_write_the_file(tmp_path):
+    save_model(tmp_path, city())
+    shared = load_model(tmp_path)['maze']
+    shared.num_states
+    session = shared.snapshot()
+    assert session.traffic_jams is shared.traffic_jams
+    session.set_traffic([(1, 3)], 5.0)
+    assert session.traffic_jams[1, 3] == 5.0
+    assert shared.traffic_jams[1, 3] == 0
+    assert load_model(tmp_path)['maze'].traffic_jams[1, 3] == 0
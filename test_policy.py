@@ -0,0 +1,89 @@
+# test_policy.py
+import numpy as np
+import pytest
+from city_generator import CityMap
+from policy import PolicyCache, PolicyField
+from q_learning import QLearningSolver
+from shortest_path import ShortestPathSolver, route_cost
+
+
+def city(size=21, seed=3, compact=False):
+    maze = CityMap(width=size, height=size, compact=compact, seed=seed)
+    maze.generate_manhattan_grid()
+    return maze
+
+
+def road_starts(maze, n=10):
+    cells = np.flatnonzero(maze.reachable(maze.end))
+    return [divmod(int(c), maze.width) for c in cells[::max(len(cells) // n, 1)]]
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_exact_field_matches_the_shortest_path_from_every_start(compact):
+    maze = city(compact=compact)
+    field = PolicyField.exact(maze)
+    for start in road_starts(maze):
+        maze.start = start
+        path = field.route(start)
+        assert path[0] == start and path[-1] == maze.end
+        assert route_cost(maze, path) == pytest.approx(route_cost(maze, ShortestPathSolver(maze).solve()))
+
+
+def test_field_does_not_keep_the_maze():
+    maze = city(compact=True)
+    field = PolicyField.exact(maze)
+    assert not any(isinstance(value, CityMap) for value in vars(field).values())
+    assert field.route((0, 0)) == []  # Building
+    assert field.route((-1, 5)) == [] and field.route((5, maze.width)) == []  # Off the map
+
+
+def test_trained_field_covers_only_its_route():
+    maze = city()
+    solver = QLearningSolver(maze, episodes=3000, batch_size=64, seed=0)
+    trained = solver.solve()
+    field = PolicyField.from_q_table(maze, solver.q_table, route=trained)
+    assert field.route(maze.start) == trained
+    assert field.route(trained[len(trained) // 2]) == trained[len(trained) // 2:]
+    off_route = next(s for s in road_starts(maze, 50) if s not in trained)
+    assert field.route(off_route) == []
+
+
+def test_cache_shares_one_field_per_destination():
+    maze = city()
+    cache = PolicyCache()
+    field = PolicyField.exact(maze)
+    cache.put(maze, {"strategy": "astar"}, field, conductivity=np.ones(maze.state_shape))
+
+    maze.start = (1, 3)
+    path, entry = cache.route(maze, {"strategy": "astar"})
+    assert entry["field"] is field and path == field.route((1, 3))
+    assert cache.route(maze, {"strategy": "hybrid"}) == (None, None)
+    maze.end = (1, maze.width - 2)
+    assert cache.get(maze, {"strategy": "astar"}) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_cache_route_reports_uncovered_starts():
+    maze = city()
+    field = PolicyField(maze, np.full(maze.num_states, -1))
+    cache = PolicyCache()
+    cache.put(maze, None, field)
+    path, entry = cache.route(maze)
+    assert path is None and entry["field"] is field
+
+
+def test_cache_evicts_least_recently_used_within_budget():
+    maze = city()
+    field = PolicyField.exact(maze)
+    cache = PolicyCache(max_bytes=int(field.nbytes * 2.5))
+    ends = [(1, maze.width - 2), (maze.height - 2, 1), maze.end]
+    for end in ends:
+        maze.end = end
+        cache.put(maze, None, field)
+    assert len(cache.entries) == 2 and cache.used_bytes <= cache.max_bytes
+    maze.end = ends[0]
+    assert cache.get(maze) is None
+    cache.put(maze, None, field)  # Same key again replaces, not duplicates
+    cache.put(maze, None, field)
+    assert cache.used_bytes == 2 * field.nbytes
+    assert cache.put(maze, None, field, conductivity=np.ones(10 ** 6)) is None  # Over budget
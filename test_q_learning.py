@@ -0,0 +1,111 @@
+# test_q_learning.py
+import numpy as np
+from city_generator import CityMap
+from q_learning import ConvergenceMonitor, QLearningSolver, episode_budget
+from shortest_path import ShortestPathSolver, route_cost
+
+
+def city(size=21, seed=3, compact=False):
+    maze = CityMap(width=size, height=size, compact=compact, seed=seed)
+    maze.generate_manhattan_grid()
+    return maze
+
+
+def is_route(maze, path):
+    """path starts at start, ends at end and moves one road cell at a time"""
+    steps = np.abs(np.diff(np.array(path), axis=0)).sum(axis=1)
+    return (path[0] == maze.start and path[-1] == maze.end and (steps == 1).all()
+            and all(maze.is_valid(x, y) for x, y in path))
+
+
+def test_batched_training_finds_a_route():
+    maze = city()
+    solver = QLearningSolver(maze, episodes=3000, batch_size=64, seed=0)
+    path = solver.solve()
+    assert is_route(maze, path)
+    assert solver.episodes_done == 3000
+    # Tabular Q-learning settles near the exact route, not necessarily on it
+    assert route_cost(maze, path) <= 1.5 * route_cost(maze, ShortestPathSolver(maze).solve())
+
+
+def test_batched_training_keeps_the_q_table_shape():
+    maze = city()
+    solver = QLearningSolver(maze, episodes=500, batch_size=32, seed=0)
+    solver.solve()
+    assert solver.q_table.shape == (maze.height, maze.width, 4)
+    # Walls only ever move toward the penalty, never above zero
+    walls = ~maze.action_mask.reshape(solver.q_table.shape)
+    assert (solver.q_table[walls] <= 0).all()
+
+
+def test_early_stopping_ends_training_once_the_route_settles():
+    maze = city()
+    solver = QLearningSolver(maze, episodes=20000, batch_size=64, progress_every=250,
+                             early_stopping=True, seed=0)
+    path = solver.solve()
+    assert solver.converged
+    assert solver.episodes_done < 20000
+    assert is_route(maze, path)
+
+
+def test_early_stopping_off_runs_the_whole_budget():
+    maze = city()
+    solver = QLearningSolver(maze, episodes=1000, batch_size=64, early_stopping=False, seed=0)
+    solver.solve()
+    assert solver.monitor is None and not solver.converged
+    assert solver.episodes_done == 1000
+
+
+def test_monitor_counts_repeated_routes():
+    class Fixed:
+        maze = city()
+        q_table = np.zeros(1)
+
+        def reconstruct_path(self):
+            return [self.maze.start, self.maze.end]
+
+    monitor = ConvergenceMonitor(patience=2, tol=None)
+    assert [monitor.update(Fixed()) for _ in range(3)] == [False, False, True]
+
+
+def test_episode_budget_grows_with_the_road_network():
+    small, large = city(21), city(61)
+    assert episode_budget(small) < episode_budget(large)
+    assert episode_budget(small, minimum=10 ** 6, maximum=10 ** 6) == 10 ** 6
+
+
+def test_compact_map_trains_on_road_states():
+    maze = city(compact=True)
+    solver = QLearningSolver(maze, episodes=3000, batch_size=64, seed=0)
+    path = solver.solve()
+    assert solver.q_table.shape == (maze.num_states, 4)
+    assert solver.q_table.dtype == np.float32
+    assert is_route(maze, path)
+
+
+def test_building_start_on_a_compact_map():
+    maze = city(compact=True)
+    maze.start = (0, 0)  # A building: it has no state
+    assert maze.state_index(maze.start) == -1
+    assert QLearningSolver(maze, episodes=100, seed=0).solve() == [(0, 0)]
+    assert QLearningSolver(maze, episodes=100, batch_size=16, seed=0).solve() == [(0, 0)]
+
+
+def test_same_seed_same_q_table():
+    maze = city()
+    for batch_size in (None, 32):
+        runs = [QLearningSolver(maze, episodes=200, batch_size=batch_size, seed=9) for _ in range(2)]
+        assert runs[0].solve() == runs[1].solve()
+        np.testing.assert_array_equal(runs[0].q_table, runs[1].q_table)
+
+
+def test_reconstruct_path_stops_on_a_loop_and_reuses_its_buffers():
+    maze = city()
+    solver = QLearningSolver(maze, seed=0)
+    right, left = 3, 2
+    x, y = maze.start
+    solver.q_table[x, y, right] = 1  # start -> its right neighbour -> back to start
+    solver.q_table[x, y + 1, left] = 1
+    assert solver.reconstruct_path() == [(x, y), (x, y + 1)]
+    assert solver.reconstruct_path() == [(x, y), (x, y + 1)]
+    assert not solver._seen.any()
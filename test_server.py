@@ -0,0 +1,103 @@
+# test_server.py
+import gzip
+import json
+import numpy as np
+import pytest
+import server
+import wire_format
+
+
+@pytest.fixture
+def client():
+    server.app.config['TESTING'] = True
+    server.solution_cache.clear()
+    server.policy_cache.clear()
+    with server.app.test_client() as client:
+        yield client
+
+
+def finished_job(client, **settings):
+    """Submits a solve through the job API and waits for it; returns the job id"""
+    body = {"start": [1, 1], "end": [39, 39], "seed": 7}
+    body.update(settings)
+    response = client.post('/jobs', json=body)
+    assert response.status_code == 202
+    job_id = response.get_json()["job_id"]
+    server.job_manager.get(job_id).future.result()
+    return job_id
+
+
+@pytest.mark.parametrize("strategy", ["astar", "planned"])
+def test_traffic_update_leaves_finished_results_alone(client, strategy):
+    job_id = finished_job(client, strategy=strategy)
+    first = client.get(f'/jobs/{job_id}/result').get_json()
+
+    jam = [list(cell) for cell in first["path"][3:6]]
+    updated = client.post('/traffic', json={"changes": [{"cells": jam, "severity": 5.0}]}).get_json()
+    assert updated["status"] == "success"
+    assert all(updated["traffic"][x][y] == 5.0 for x, y in jam)
+    assert updated["path"][0] == [1, 1] and updated["path"][-1] == [39, 39]
+
+    again = client.get(f'/jobs/{job_id}/result').get_json()
+    for name in ("traffic", "conductivity", "path"):
+        assert again[name] == first[name], name
+
+
+def test_traffic_needs_a_map_and_straight_segments(client):
+    change = {"from": [1, 3], "to": [1, 6], "severity": 5}
+    assert client.post('/traffic', json={"changes": [change]}).status_code == 404
+    finished_job(client, strategy="astar")
+    diagonal = dict(change, to=[2, 6])
+    assert client.post('/traffic', json={"changes": [diagonal]}).status_code == 400
+
+
+def test_if_none_match_leaves_out_held_layers(client):
+    job_id = finished_job(client, strategy="astar")
+    url = f'/jobs/{job_id}/result'
+    full = client.get(url)
+    etags = full.get_json()["etags"]
+    assert 'If-None-Match' in full.headers['Vary']
+
+    held = client.get(url, headers={'If-None-Match': f'"{etags["grid"]}", "t-stale"'}).get_json()
+    assert held["unchanged"] == ["grid"] and "grid" not in held
+    assert held["traffic"] == full.get_json()["traffic"]
+
+    # An empty tag holds nothing
+    empty = client.get(url, headers={'If-None-Match': '""'}).get_json()
+    assert empty["unchanged"] == [] and "grid" in empty
+
+
+def test_binary_results_name_their_layer_etags(client):
+    job_id = finished_job(client, strategy="astar")
+    url = f'/jobs/{job_id}/result'
+    etags = client.get(url).get_json()["etags"]
+    response = client.get(url, headers={'Accept': wire_format.MIME_TYPE,
+                                        'If-None-Match': f'"{etags["traffic"]}"'})
+    assert response.mimetype == wire_format.MIME_TYPE
+    assert set(response.headers['X-Layer-ETags'].split(', ')) == {f'"{e}"' for e in etags.values()}
+    decoded = wire_format.decode(response.data)
+    assert decoded["traffic"] is None and decoded["grid"] is not None
+    assert decoded["path"][-1] == (39, 39)
+
+
+def test_traffic_response_is_a_delta_against_the_held_layer(client):
+    job_id = finished_job(client, strategy="astar")
+    first = client.get(f'/jobs/{job_id}/result').get_json()
+    jam = [list(cell) for cell in first["path"][3:6]]
+    response = client.post('/traffic', json={"changes": [{"cells": jam, "severity": 5.0}]},
+                           headers={'If-None-Match': ', '.join(f'"{e}"' for e in first["etags"].values())})
+    payload = response.get_json()
+    assert payload["unchanged"] == ["grid"]
+    delta = payload["deltas"]["traffic"]
+    assert delta["base"] == first["etags"]["traffic"]
+    traffic = np.array(first["traffic"]).ravel()
+    traffic[delta["cells"]] = delta["values"]
+    assert all(traffic.reshape(41, 41)[x, y] == 5.0 for x, y in jam)
+
+
+def test_large_json_is_gzipped(client):
+    job_id = finished_job(client, strategy="astar")
+    response = client.get(f'/jobs/{job_id}/result', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert json.loads(gzip.decompress(response.data))["path"][-1] == [39, 39]
@@ -0,0 +1,43 @@
+# test_slime_mold.py
+import numpy as np
+from city_generator import CityMap
+from slime_mold import SlimeMoldSolver
+
+
+def city(size=21, seed=3, compact=False):
+    maze = CityMap(width=size, height=size, compact=compact, seed=seed)
+    maze.generate_manhattan_grid()
+    return maze
+
+
+def test_same_seed_same_conductivity():
+    maze = city()
+    first = SlimeMoldSolver(maze, max_iters=20, seed=4).solve()
+    np.testing.assert_array_equal(first, SlimeMoldSolver(maze, max_iters=20, seed=4).solve())
+
+
+def test_update_traffic_changes_only_the_traffic_term():
+    maze = city()
+    solver = SlimeMoldSolver(maze, max_iters=20, seed=4)
+    original = solver.solve().copy()
+    cells = [(1, x) for x in range(2, 6) if maze.is_valid(1, x)]
+    changed, before = maze.set_traffic(cells, 5.0)
+    states = solver.update_traffic(changed, before)
+
+    expected = original.copy()
+    expected.reshape(-1)[states] += (1 / 6 - 1 / (1 + before)) / solver.scale
+    np.testing.assert_allclose(solver.conductivity, expected)
+
+    # Clearing the jam again restores the solved conductivity
+    changed, before = maze.set_traffic(cells, 0.0)
+    solver.update_traffic(changed, before)
+    np.testing.assert_allclose(solver.conductivity, original)
+
+
+def test_adopt_recovers_the_scale():
+    maze = city(compact=True)
+    solved = SlimeMoldSolver(maze, max_iters=20, seed=4)
+    conductivity = solved.solve()
+    fresh = SlimeMoldSolver(maze, seed=5)
+    fresh.adopt(conductivity.copy())
+    assert np.isclose(fresh.scale, solved.scale, rtol=1e-5)  # float32 conductivity
@@ -0,0 +1,48 @@
+# test_visualizer.py
+import numpy as np
+from PIL import Image
+from city_generator import CityMap
+from shortest_path import ShortestPathSolver
+from visualizer import animate_maze_solution, road_segments, show_slime_phase
+
+
+def city(size=21, seed=3, compact=False):
+    maze = CityMap(width=size, height=size, compact=compact, seed=seed)
+    maze.generate_manhattan_grid()
+    return maze
+
+
+def test_road_segments_join_every_connected_pair():
+    grid = city().grid
+    expected = set()
+    for x in range(grid.shape[0]):
+        for y in range(grid.shape[1]):
+            if grid[x, y] == 0 and x + 1 < grid.shape[0] and grid[x + 1, y] == 0:
+                expected.add(((y, x - 0.2), (y, x + 1.2)))
+            if grid[x, y] == 0 and y + 1 < grid.shape[1] and grid[x, y + 1] == 0:
+                expected.add(((y - 0.2, x), (y + 1.2, x)))
+    segments = road_segments(grid)
+    assert segments.shape == (len(expected), 2, 2)
+    assert {tuple(map(tuple, s)) for s in segments.tolist()} == expected
+
+
+def test_gif_export_has_one_frame_per_sampled_step(tmp_path):
+    maze = city()
+    path = ShortestPathSolver(maze).solve()
+    target = tmp_path / "route.gif"
+    animate_maze_solution(maze, path, save_to=str(target), max_frames=10, dpi=30)
+    with Image.open(target) as gif:
+        assert gif.n_frames == 10
+        first = np.asarray(gif.convert('RGB')).copy()
+        gif.seek(gif.n_frames - 1)
+        last = np.asarray(gif.convert('RGB'))
+    assert first.shape == last.shape == (360, 360, 3)  # 12in figure at dpi 30
+    assert (first != last).any()  # The route grows across frames
+
+
+def test_png_exports(tmp_path):
+    maze = city()
+    path = ShortestPathSolver(maze).solve()
+    animate_maze_solution(maze, path, save_to=str(tmp_path / "route.png"), dpi=30)
+    show_slime_phase(maze, np.ones(maze.state_shape), save_to=str(tmp_path / "slime.png"))
+    assert (tmp_path / "route.png").stat().st_size > 0 and (tmp_path / "slime.png").stat().st_size > 0
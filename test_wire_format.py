@@ -0,0 +1,108 @@
+# test_wire_format.py
+import numpy as np
+import pytest
+import wire_format
+
+
+def sample(height=7, width=9, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        "status": "success",
+        "dimensions": {"width": width, "height": height},
+        "grid": (rng.random((height, width)) < 0.4).astype(float),
+        "traffic": np.where(rng.random((height, width)) < 0.2, 5.0, 0.0),
+        "conductivity": rng.random((height, width)),
+        "path": [(1, 1), (1, 2), (2, 2)],
+        "start": (1, 1),
+        "end": (2, 2),
+    }
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_round_trip(compress):
+    result = sample()
+    decoded = wire_format.decode(wire_format.encode_result(result, compress=compress))
+    np.testing.assert_array_equal(decoded["grid"], result["grid"])
+    np.testing.assert_allclose(decoded["traffic"], result["traffic"])  # 0 and the max are exact
+    np.testing.assert_allclose(decoded["conductivity"], result["conductivity"], atol=1e-3)  # float16
+    assert decoded["path"] == result["path"]
+    assert decoded["start"] == result["start"] and decoded["end"] == result["end"]
+    assert decoded["status"] == "success"
+    assert decoded["dimensions"] == result["dimensions"]
+
+
+def test_quantized_conductivity():
+    result = sample()
+    decoded = wire_format.decode(wire_format.encode_result(result, quantize=True))
+    np.testing.assert_allclose(decoded["conductivity"], result["conductivity"], atol=0.5 / 255 + 1e-9)
+
+
+def test_omitted_and_missing_layers_decode_as_none():
+    result = sample()
+    result["conductivity"] = None
+    data = wire_format.encode_result(result, omit=("grid",))
+    decoded = wire_format.decode(data)
+    assert decoded["grid"] is None and decoded["conductivity"] is None
+    np.testing.assert_allclose(decoded["traffic"], result["traffic"])
+    assert decoded["path"] == result["path"]
+    assert len(data) < len(wire_format.encode_result(sample()))
+
+
+def test_error_result_and_empty_path():
+    result = sample()
+    result.update(status="error", path=[])
+    decoded = wire_format.decode(wire_format.encode_result(result))
+    assert decoded["status"] == "error" and decoded["path"] == []
+
+
+def test_rejects_other_payloads():
+    with pytest.raises(ValueError):
+        wire_format.decode(b'XXXX' + wire_format.encode_result(sample())[4:])
+
+
+def test_layer_etags_follow_content():
+    result = sample()
+    etags = wire_format.layer_etags(result)
+    assert sorted(etags) == sorted(wire_format.LAYERS)
+    assert etags == wire_format.layer_etags(sample())
+    changed = sample()
+    changed["traffic"][0, 0] += 1
+    again = wire_format.layer_etags(changed)
+    assert again["traffic"] != etags["traffic"] and again["grid"] == etags["grid"]
+    changed["conductivity"] = None
+    assert "conductivity" not in wire_format.layer_etags(changed)
+
+
+def test_json_payload_leaves_out_held_layers():
+    result = sample()
+    etags = wire_format.layer_etags(result)
+    payload = wire_format.json_payload(result, held={etags["grid"], "c-unknown"})
+    assert payload["unchanged"] == ["grid"] and "grid" not in payload
+    assert payload["traffic"] == result["traffic"].tolist()
+    assert payload["etags"] == etags and payload["deltas"] == {}
+
+
+def test_json_payload_sends_small_changes_as_deltas():
+    store = wire_format.LayerStore()
+    result = sample()
+    old_tag = wire_format.json_payload(result, store=store)["etags"]["traffic"]
+    changed = sample()
+    changed["traffic"][1, 2] = 5.0
+    changed["traffic"][3, 4] = 0.0
+    payload = wire_format.json_payload(changed, held={old_tag}, store=store)
+    delta = payload["deltas"]["traffic"]
+    assert "traffic" not in payload and delta["base"] == old_tag
+    rebuilt = result["traffic"].ravel().copy()
+    rebuilt[delta["cells"]] = delta["values"]
+    np.testing.assert_array_equal(rebuilt, changed["traffic"].ravel())
+    # A delta only goes out against a base of the same kind
+    assert "conductivity" in payload
+
+
+def test_layer_store_stays_within_its_budget():
+    store = wire_format.LayerStore(max_bytes=3 * 8 * 100)
+    for i in range(5):
+        store.remember(f"t-{i}", np.full(100, float(i)))
+    assert list(store.layers) == ["t-2", "t-3", "t-4"] and store.used_bytes == 3 * 8 * 100
+    store.remember("t-big", np.zeros(1000))
+    assert "t-big" not in store.layers
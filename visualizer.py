@@ -2,12 +2,97 @@
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 import matplotlib.colors as mcolors
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
 import numpy as np
-
-
-def show_slime_phase(maze, conductivity, title="Phase 1: Traffic Sensor Network"):
+from PIL import Image
+
+# Road markings are skipped above this many cells per side: at the default
+# figure size they shrink to a few pixels and just grey out the asphalt
+MAX_MARKING_SIZE = 101
+
+
+def new_figure(headless, figsize=(12, 12)):
+    """pyplot figure to show, or a standalone Agg figure for writing files.
+
+    The Agg figure never touches pyplot's backend or figure registry, so
+    exports work without a display and are freed with their last reference.
+    """
+    if not headless:
+        return plt.subplots(figsize=figsize)
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig, fig.subplots()
+
+
+def road_segments(grid):
+    """Marking segments between connected road cells, as (N, 2, 2) (col, row) endpoints"""
+    road = np.asarray(grid) == 0
+    vx, vy = np.nonzero(road[:-1, :] & road[1:, :])  # Cell and the one below
+    hx, hy = np.nonzero(road[:, :-1] & road[:, 1:])  # Cell and the one to the right
+    vertical = np.stack([np.stack([vy, vx - 0.2], axis=1), np.stack([vy, vx + 1.2], axis=1)], axis=1)
+    horizontal = np.stack([np.stack([hy - 0.2, hx], axis=1), np.stack([hy + 1.2, hx], axis=1)], axis=1)
+    return np.concatenate([vertical, horizontal]).astype(float)
+
+
+def freeze_background(fig, moving, dpi):
+    """Renders everything but the moving artists once and swaps it for that raster.
+
+    Each exported frame then draws one image plus the moving artists
+    instead of every layer, so frame cost does not grow with the map.
+    """
+    fig.set_dpi(dpi)
+    for artist in moving:
+        artist.set_visible(False)
+    fig.canvas.draw()
+    background = np.asarray(fig.canvas.buffer_rgba()).copy()
+
+    static = [fig.patch]
+    for ax in fig.axes:
+        static += ax.images + ax.collections + ax.lines + ax.texts + [ax.title, ax.patch]
+        if ax.get_legend() is not None:
+            static.append(ax.get_legend())
+    for artist in static:
+        artist.set_visible(False)
+    for artist in moving:
+        artist.set_visible(True)
+    fig.figimage(background, origin='upper', zorder=-1)
+
+
+def write_gif(fig, moving, update, frames, save_to, dpi, interval):
+    """Writes the frames of update to save_to by blitting the moving artists.
+
+    The figure is drawn once; every frame restores that raster and draws
+    only the moving artists, then all frames share one palette taken from
+    the last (fullest) frame instead of being quantized one by one.
+    """
+    fig.set_dpi(dpi)
+    canvas = fig.canvas
+    for artist in moving:
+        artist.set_visible(False)
+    canvas.draw()
+    background = canvas.copy_from_bbox(fig.bbox)
+    for artist in moving:
+        artist.set_visible(True)
+
+    images = []
+    for frame in frames:
+        canvas.restore_region(background)
+        for artist in update(frame):
+            artist.axes.draw_artist(artist)
+        images.append(Image.fromarray(np.asarray(canvas.buffer_rgba())[..., :3].copy()))
+
+    palette = images[-1].quantize(colors=256)
+    images = [image.quantize(palette=palette, dither=Image.Dither.NONE) for image in images]
+    images[0].save(save_to, save_all=True, append_images=images[1:], duration=int(interval), loop=0,
+                   optimize=False)
+
+
+def show_slime_phase(maze, conductivity, title="Phase 1: Traffic Sensor Network", save_to=None):
+    """Shows the conductivity heatmap, or writes it to save_to (e.g. .png) headlessly"""
     # Dark Mode Background
-    fig, ax = plt.subplots(figsize=(12, 12))
+    fig, ax = new_figure(save_to is not None)
     fig.patch.set_facecolor('#121212')
     ax.set_facecolor('#121212')
 
@@ -26,7 +111,7 @@ def show_slime_phase(maze, conductivity, title="Phase 1: Traffic Sensor Network"
     im = ax.imshow(conductivity, cmap='inferno', alpha=0.6, zorder=2)
 
     # Custom Colorbar
-    cbar = plt.colorbar(im, ax=ax, fraction=0.046, pad=0.04)
+    cbar = fig.colorbar(im, ax=ax, fraction=0.046, pad=0.04)
     cbar.set_label('Traffic Potential', color='white')
     cbar.ax.yaxis.set_tick_params(color='white')
     plt.setp(plt.getp(cbar.ax.axes, 'yticklabels'), color='white')
@@ -39,12 +124,24 @@ def show_slime_phase(maze, conductivity, title="Phase 1: Traffic Sensor Network"
 
     ax.set_title(title, color='white', fontsize=16, fontweight='bold', pad=20)
     ax.axis('off')
-    plt.tight_layout()
+    fig.tight_layout()
+    if save_to is not None:
+        fig.savefig(save_to, facecolor=fig.get_facecolor())
+        print(f"✅ Heatmap saved to {save_to}")
+        return
     plt.show()
 
 
-def animate_maze_solution(maze, path, conductivity=None, title="Phase 2: Smart Navigation", interval=80):
-    fig, ax = plt.subplots(figsize=(12, 12))
+def animate_maze_solution(maze, path, conductivity=None, title="Phase 2: Smart Navigation", interval=80,
+                          save_to=None, max_frames=300, dpi=100):
+    """Animates the car along path, or writes the animation to save_to.
+
+    save_to renders headlessly on Agg: .gif (Pillow, blitted), .mp4 and other video
+    formats (ffmpeg) or .png (the final frame). Exported routes advance
+    several cells per frame when they are longer than max_frames.
+    """
+    headless = save_to is not None
+    fig, ax = new_figure(headless)
     fig.patch.set_facecolor('#050505')  # Deep Black Window
     ax.set_facecolor('#1a1a1a')  # Dark Map
 
@@ -57,15 +154,12 @@ def animate_maze_solution(maze, path, conductivity=None, title="Phase 2: Smart N
     ax.imshow(roads, cmap=mcolors.ListedColormap(['#404040']), zorder=1)
 
     # 3. DRAW ROAD MARKINGS (Dashed White Lines)
-    # This creates the "Street" look
-    for x in range(maze.height):
-        for y in range(maze.width):
-            if maze.grid[x, y] == 0:
-                # Add markings only if connected
-                if x + 1 < maze.height and maze.grid[x + 1, y] == 0:  # Vertical
-                    ax.plot([y, y], [x - 0.2, x + 1.2], color='#606060', linestyle=':', linewidth=1, zorder=1.5)
-                if y + 1 < maze.width and maze.grid[x, y + 1] == 0:  # Horizontal
-                    ax.plot([y - 0.2, y + 1.2], [x, x], color='#606060', linestyle=':', linewidth=1, zorder=1.5)
+    # This creates the "Street" look. One collection holds every segment
+    # between connected road cells, instead of one artist per pair
+    if max(maze.height, maze.width) <= MAX_MARKING_SIZE:
+        markings = LineCollection(road_segments(maze.grid), colors='#606060', linestyles=':',
+                                  linewidths=1, zorder=1.5)
+        ax.add_collection(markings, autolim=False)
 
     # 4. TRAFFIC CLUSTERS (Glowing Red)
     if hasattr(maze, 'traffic_jams'):
@@ -113,9 +207,36 @@ def animate_maze_solution(maze, path, conductivity=None, title="Phase 2: Smart N
         glow.set_data(x_data, y_data)
         return line, glow
 
+    frames = len(path)
+    if headless:
+        # Evenly spaced route prefixes, always ending on the full route
+        frames = np.unique(np.linspace(0, len(path) - 1, min(len(path), max_frames)).round().astype(int))
+
+    fig.tight_layout()
+    if headless and save_to.lower().endswith('.png'):
+        update(len(path) - 1)
+        fig.savefig(save_to, dpi=dpi, facecolor=fig.get_facecolor())
+        print(f"✅ Route image saved to {save_to}")
+        return
+    if headless and save_to.lower().endswith('.gif'):
+        write_gif(fig, [line, glow], update, frames, save_to, dpi, interval)
+        print(f"✅ Animation saved to {save_to}")
+        return
+    if headless:
+        freeze_background(fig, [line, glow], dpi)
+
     ani = animation.FuncAnimation(
         fig, update, init_func=init,
-        frames=len(path), interval=interval, blit=True, repeat=False
+        frames=frames, interval=interval, blit=True, repeat=False
     )
-    plt.tight_layout()
-    plt.show()
\ No newline at end of file
+    if not headless:
+        plt.show()
+        return
+
+    fps = max(1000 / interval, 1)
+    if animation.writers.is_available('ffmpeg'):
+        writer = animation.FFMpegWriter(fps=fps)
+    else:
+        raise RuntimeError(f"Saving {save_to} needs ffmpeg; use a .gif or .png file instead")
+    ani.save(save_to, writer=writer, dpi=dpi, savefig_kwargs={'facecolor': fig.get_facecolor()})
+    print(f"✅ Animation saved to {save_to}")
\ No newline at end of file
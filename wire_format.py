@@ -0,0 +1,245 @@
+# wire_format.py
+"""Compact binary encoding of a simulation (grid, traffic, conductivity, path).
+
+Layout, little-endian:
+
+    header  magic b'MZS1', version u8, flags u8, status u8, pad u8,
+            height u32, width u32, path_len u32,
+            start (u32, u32), end (u32, u32), traffic_scale f32
+    body    grid       bit-plane, 1 = building  (ceil(H*W / 8) bytes)
+            traffic    uint8, value * traffic_scale / 255   (H*W bytes)
+            conductivity float16 (H*W*2 bytes), or uint8 / 255 with
+                       FLAG_QUANTIZED (H*W bytes)
+            path       (row, col) u32 pairs    (path_len * 8 bytes)
+
+With FLAG_ZLIB the body is zlib-compressed; the header never is. A layer
+passed as None (one the receiver already holds) is left out of the body and
+flagged with FLAG_NO_GRID, FLAG_NO_TRAFFIC or FLAG_NO_CONDUCTIVITY; decode
+returns None for it.
+
+The JSON form (json_payload) carries the same layers as nested lists, each
+named by a content ETag so clients can say which ones they already hold.
+"""
+import hashlib
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+import numpy as np
+
+MIME_TYPE = 'application/vnd.maze-sim'
+LAYERS = ('grid', 'traffic', 'conductivity')
+MIME_TYPE_ZLIB = 'application/vnd.maze-sim+zlib'
+
+MAGIC = b'MZS1'
+VERSION = 1
+FLAG_ZLIB = 1
+FLAG_QUANTIZED = 2
+FLAG_NO_GRID = 4
+FLAG_NO_TRAFFIC = 8
+FLAG_NO_CONDUCTIVITY = 16
+
+_HEADER = struct.Struct('<4sBBBBIIIIIIIf')
+
+
+def encode(grid, traffic, conductivity, path, start, end, status="success",
+           compress=False, quantize=False, shape=None):
+    """shape (height, width) is only needed when grid is None"""
+    height, width = np.shape(grid) if grid is not None else shape
+    path = np.asarray(path if path else np.zeros((0, 2)), dtype='<u4').reshape(-1, 2)
+    flags = (FLAG_ZLIB if compress else 0) | (FLAG_QUANTIZED if quantize else 0)
+    parts = []
+
+    if grid is None:
+        flags |= FLAG_NO_GRID
+    else:
+        parts.append(np.packbits(np.asarray(grid).ravel() != 0).tobytes())
+
+    traffic_scale = 1.0
+    if traffic is None:
+        flags |= FLAG_NO_TRAFFIC
+    else:
+        traffic = np.asarray(traffic, dtype=np.float64)
+        # Traffic is quantized against its own maximum (0 and the max stay exact)
+        traffic_scale = float(traffic.max()) if traffic.size and traffic.max() > 0 else 1.0
+        parts.append(np.rint(np.clip(traffic, 0, None) / traffic_scale * 255).astype(np.uint8).tobytes())
+
+    if conductivity is None:
+        flags |= FLAG_NO_CONDUCTIVITY
+    elif quantize:
+        parts.append(np.rint(np.clip(np.asarray(conductivity, dtype=np.float64), 0, 1) * 255)
+                     .astype(np.uint8).tobytes())
+    else:
+        parts.append(np.asarray(conductivity, dtype=np.float64).astype('<f2').tobytes())
+
+    parts.append(path.tobytes())
+    body = b''.join(parts)
+    if compress:
+        body = zlib.compress(body, 6)
+
+    header = _HEADER.pack(MAGIC, VERSION, flags, 0 if status == "success" else 1, 0,
+                          height, width, len(path), start[0], start[1], end[0], end[1],
+                          traffic_scale)
+    return header + body
+
+
+def encode_result(result, compress=False, quantize=False, omit=()):
+    """Encodes a solver result dict (as built by server.run_solve).
+
+    omit: names of layers ('grid', 'traffic', 'conductivity') to leave out.
+    """
+    layers = [None if name in omit else result[name] for name in LAYERS]
+    dims = result["dimensions"]
+    return encode(*layers, result["path"], result["start"], result["end"], status=result["status"],
+                  compress=compress, quantize=quantize, shape=(dims["height"], dims["width"]))
+
+
+def decode(data):
+    """Inverse of encode; returns a dict of numpy arrays"""
+    (magic, version, flags, status, _, height, width, path_len,
+     sx, sy, ex, ey, traffic_scale) = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a maze-sim payload")
+
+    body = data[_HEADER.size:]
+    if flags & FLAG_ZLIB:
+        body = zlib.decompress(body)
+
+    size = height * width
+    offset = 0
+    grid_bytes = (size + 7) // 8
+    grid = traffic = conductivity = None
+    if not flags & FLAG_NO_GRID:
+        grid = np.unpackbits(np.frombuffer(body, np.uint8, grid_bytes, offset))[:size]
+        grid = grid.reshape(height, width).astype(int)
+        offset += grid_bytes
+
+    if not flags & FLAG_NO_TRAFFIC:
+        traffic = np.frombuffer(body, np.uint8, size, offset) * (traffic_scale / 255)
+        traffic = traffic.reshape(height, width)
+        offset += size
+
+    if not flags & FLAG_NO_CONDUCTIVITY:
+        if flags & FLAG_QUANTIZED:
+            conductivity = np.frombuffer(body, np.uint8, size, offset) / 255
+            offset += size
+        else:
+            conductivity = np.frombuffer(body, '<f2', size, offset).astype(np.float64)
+            offset += size * 2
+        conductivity = conductivity.reshape(height, width)
+
+    path = np.frombuffer(body, '<u4', path_len * 2, offset).reshape(-1, 2)
+
+    return {
+        "status": "success" if status == 0 else "error",
+        "dimensions": {"width": width, "height": height},
+        "grid": grid,
+        "traffic": traffic,
+        "conductivity": conductivity,
+        "path": [tuple(int(v) for v in p) for p in path],
+        "start": (sx, sy),
+        "end": (ex, ey),
+    }
+
+
+# --- JSON payload ----------------------------------------------------------
+
+def layer_values(result, name):
+    """A result layer as the flat values clients receive (grid as 0/1)"""
+    if name == 'grid':
+        return (np.asarray(result["grid"]) != 0).astype(np.uint8).ravel()
+    return np.asarray(result[name], dtype=np.float64).ravel()
+
+
+def layer_etags(result):
+    """Content ETag of each layer in result (None layers have none)"""
+    etags = {}
+    for name in LAYERS:
+        if result.get(name) is None:
+            continue
+        values = layer_values(result, name)
+        digest = hashlib.blake2b(values.tobytes(), digest_size=12)
+        digest.update(str(np.shape(result[name])).encode())
+        etags[name] = f"{name[0]}-{digest.hexdigest()}"
+    return etags
+
+
+class LayerStore:
+    """LRU of sent layers by ETag under a byte budget, the bases for deltas.
+
+    Safe to share between request threads.
+    """
+
+    def __init__(self, max_bytes=32 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.layers = OrderedDict()
+        self.used_bytes = 0
+        self._lock = threading.Lock()
+
+    def remember(self, etag, values):
+        """Keeps a sent layer as a delta base"""
+        if values.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if etag in self.layers:
+                self.layers.move_to_end(etag)
+                return
+            self.layers[etag] = values.copy()
+            self.used_bytes += values.nbytes
+            while self.used_bytes > self.max_bytes:
+                _, evicted = self.layers.popitem(last=False)
+                self.used_bytes -= evicted.nbytes
+
+    def delta(self, etag, values, held):
+        """Sparse change from a held layer of the same kind, when it beats resending it"""
+        for base_tag in held:
+            if not isinstance(base_tag, str) or base_tag[:1] != etag[:1]:
+                continue  # Another kind of layer, or a tag we never issued
+            with self._lock:
+                base = self.layers.get(base_tag)
+            if base is None or base.shape != values.shape:
+                continue
+            cells = np.flatnonzero(base != values)
+            # Two numbers per changed cell against one per cell
+            if 2 * len(cells) < len(values):
+                return {"base": base_tag, "cells": cells.tolist(), "values": values[cells].tolist()}
+        return None
+
+    def clear(self):
+        with self._lock:
+            self.layers.clear()
+            self.used_bytes = 0
+
+
+def json_payload(result, held=(), store=None):
+    """JSON-ready copy of a solver result (nested lists).
+
+    held: layer ETags the client already has. Those layers are left out and
+    listed under "unchanged"; with a LayerStore, a layer that differs little
+    from a held one goes out as a sparse entry of "deltas" ({"base",
+    "cells", "values"} with flat cell indices). "etags" names the layers
+    the client ends up with.
+    """
+    payload = dict(result)
+    etags = layer_etags(result)
+    payload["etags"] = etags
+    payload["unchanged"] = []
+    payload["deltas"] = {}
+    for name, etag in etags.items():
+        if etag in held:
+            payload["unchanged"].append(name)
+            del payload[name]
+            continue
+        delta = None
+        if store is not None:
+            values = layer_values(result, name)
+            store.remember(etag, values)
+            delta = store.delta(etag, values, held)
+        if delta is not None:
+            payload["deltas"][name] = delta
+            del payload[name]
+        elif name == 'grid':
+            payload[name] = result[name].astype(int).tolist()
+        else:
+            payload[name] = result[name].tolist()
+    return payload